@@ -0,0 +1,34 @@
+"""
+Make the plugin's modules importable outside a running bot.
+
+Importing anything under `src.plugins.gokz` normally runs the plugin's `__init__`,
+which loads every sub plugin and connects to MySQL. Benchmarks only need the pure
+helpers, so the package is registered as a bare namespace and nonebot is initialised
+without a driver that needs network access.
+"""
+import os
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PLUGIN_DIR = ROOT / "src" / "plugins" / "gokz"
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def bootstrap():
+    if "src.plugins.gokz" in sys.modules:
+        return
+
+    os.chdir(ROOT)  # data/ paths in the plugin are relative to the repo root
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+    import nonebot
+    nonebot.init(driver="~none")
+    nonebot.load_plugin("nonebot_plugin_localstore")
+
+    import src.plugins  # noqa: F401
+    package = types.ModuleType("src.plugins.gokz")
+    package.__path__ = [str(PLUGIN_DIR)]
+    sys.modules["src.plugins.gokz"] = package
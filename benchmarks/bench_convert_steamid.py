@@ -0,0 +1,93 @@
+"""
+convert_steamid: arithmetic fast path + memo vs constructing steam.steamid.SteamID on every call.
+
+    python -m benchmarks.bench_convert_steamid
+"""
+import random
+import timeit
+
+from benchmarks._bootstrap import bootstrap
+
+bootstrap()
+
+from nonebot import logger  # noqa: E402
+
+from src.plugins.gokz.core import steam_user  # noqa: E402
+from src.plugins.gokz.core.steam_user import convert_steamid, _convert_steamid, _convert_steamid_slow  # noqa: E402
+
+TARGETS = (2, 3, 32, 64, '64', 0)
+EDGE_CASES = [
+    '0', '1', 1, 2 ** 32 - 1, 2 ** 32, 2 ** 64, 'STEAM_0:1:0', 'STEAM_2:0:5', 'STEAM_1:0:0',
+    '[U:1:0]', '[U:1:22202]', '[U:1:22202:2]', '[g:1:4]', '103582791429521412',
+    76561198000000000 | (5 << 32), ' 76561198222767300', 'https://steamcommunity.com/id/x', '１２３',
+]
+
+
+def legacy_convert_steamid(steamid, target_type=2, url=False):
+    # the original: eager f-string debug log + a SteamID object per call
+    logger.debug(f"Converting SteamID: {steamid} to type: {target_type}")
+    return _convert_steamid_slow(steamid, target_type, url)
+
+
+def make_ids(count=3000, seed=0):
+    rng = random.Random(seed)
+    ids = []
+    for _ in range(count):
+        account_id = rng.randrange(1, 2 ** 31)
+        ids.append(rng.choice((
+            account_id,
+            str(account_id),
+            str(steam_user.INDIVIDUAL_STEAM64_BASE + account_id),
+            steam_user.INDIVIDUAL_STEAM64_BASE + account_id,
+            f"STEAM_{rng.randint(0, 1)}:{account_id & 1}:{account_id >> 1}",
+            f"[U:1:{account_id}]",
+        )))
+    return ids
+
+
+def outcome(func, *args):
+    try:
+        return func(*args)
+    except ValueError as e:
+        return f"ValueError: {e}"
+
+
+def main():
+    ids = make_ids()
+
+    mismatches = []
+    for steamid in ids[:500] + EDGE_CASES:
+        for target in TARGETS:
+            _convert_steamid.cache_clear()
+            if outcome(convert_steamid, steamid, target) != outcome(_convert_steamid_slow, steamid, target, False):
+                mismatches.append((steamid, target))
+        if outcome(convert_steamid, steamid, 2, True) != outcome(_convert_steamid_slow, steamid, 2, True):
+            mismatches.append((steamid, 'url'))
+    print(f"checked {len(ids[:500] + EDGE_CASES)} ids x {len(TARGETS) + 1} targets, mismatches: {mismatches or 0}")
+
+    def run(func):
+        for steamid in ids:
+            func(steamid, 64, False)
+            func(steamid, 2, False)
+
+    def cold(steamid, target, url):
+        _convert_steamid.cache_clear()
+        return _convert_steamid(steamid, target, url)
+
+    calls = len(ids) * 2
+    # keep the debug records out of the terminal, they still get built and filtered like in the bot
+    logger.remove()
+    logger.add(lambda _: None, level="INFO")
+
+    legacy = timeit.timeit(lambda: run(legacy_convert_steamid), number=3) / 3 / calls
+    miss = timeit.timeit(lambda: run(cold), number=3) / 3 / calls
+    run(convert_steamid)
+    hit = timeit.timeit(lambda: run(convert_steamid), number=3) / 3 / calls
+
+    print(f"legacy (SteamID + eager log): {legacy * 1e6:6.2f} us/call")
+    print(f"memo miss (arithmetic + log): {miss * 1e6:6.2f} us/call (includes a cache_clear per call)")
+    print(f"memo hit:                     {hit * 1e6:6.2f} us/call ({legacy / hit:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+/群排名: one indexed join vs looking up every group member on its own,
+on a synthetic sqlite database with 100k users / leaderboard rows.
+
+    python -m benchmarks.bench_group_rank
+"""
+import random
+import time
+import timeit
+
+from benchmarks._bootstrap import bootstrap
+
+bootstrap()
+
+from sqlalchemy import insert, text  # noqa: E402
+from sqlmodel import SQLModel, Session, create_engine, select  # noqa: E402
+
+from src.plugins.gokz.db.crud import group_ranking_statement  # noqa: E402
+from src.plugins.gokz.db.models import User, Leaderboard, GroupMember  # noqa: E402
+
+PLAYERS = 100_000
+GROUPS = 500
+GROUP_SIZE = (20, 600)
+
+
+def populate(engine, seed=0):
+    rng = random.Random(seed)
+    users = [
+        {'qid': f"qid{i:06d}", 'name': f"user{i}", 'steamid': f"STEAM_1:{i & 1}:{i}", 'mode': 'kz_timer'}
+        for i in range(PLAYERS)
+    ]
+    leaderboard = [
+        {'steamid': f"STEAM_1:{i & 1}:{i}", 'name': f"player{i}", 'pts_skill': round(rng.uniform(0, 10), 2),
+         'total_points': rng.randrange(0, 3_000_000), 'rank_name': 'Amateur'}
+        for i in range(PLAYERS)
+    ]
+    members = []
+    for g in range(GROUPS):
+        for i in rng.sample(range(PLAYERS), rng.randint(*GROUP_SIZE)):
+            members.append({'group_openid': f"group{g:04d}", 'qid': f"qid{i:06d}"})
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), users)
+        conn.execute(insert(Leaderboard), leaderboard)
+        conn.execute(insert(GroupMember), members)
+    return len(members)
+
+
+def per_member_ranking(session: Session, group_openid: str, limit=20):
+    """what the handler would do without the join: one lookup per member"""
+    qids = session.exec(select(GroupMember.qid).where(GroupMember.group_openid == group_openid)).all()
+    rows = []
+    for qid in qids:
+        user = session.get(User, qid)
+        player = session.get(Leaderboard, user.steamid) if user else None
+        if player and player.pts_skill is not None:
+            rows.append((qid, player.name, player.pts_skill))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:limit]
+
+
+def main():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    start = time.perf_counter()
+    members = populate(engine)
+    print(f"{PLAYERS} users + leaderboard rows, {members} memberships in {GROUPS} groups "
+          f"({time.perf_counter() - start:.1f}s to build)")
+
+    statement = group_ranking_statement("group0000")
+    with engine.connect() as conn:
+        compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+        plan = conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    print("query plan:")
+    for row in plan:
+        print(f"  {row[-1]}")
+
+    groups = [f"group{g:04d}" for g in range(0, GROUPS, 5)]
+    with Session(engine) as session:
+        same = all(
+            [r.pts_skill for r in session.exec(group_ranking_statement(g)).all()]
+            == [pts for _, _, pts in per_member_ranking(session, g)]
+            for g in groups[:10]
+        )
+        print(f"same top 20 as per-member lookups: {same}")
+
+        joined = timeit.timeit(lambda: [session.exec(group_ranking_statement(g)).all() for g in groups], number=3)
+
+        def cold_lookups():
+            # start every group with an empty identity map, like a fresh request would
+            for g in groups:
+                session.expunge_all()
+                per_member_ranking(session, g)
+
+        lookups = timeit.timeit(cold_lookups, number=3)
+
+    per_query = 3 * len(groups)
+    print(f"join:               {joined / per_query * 1000:7.2f} ms/group")
+    print(f"per-member lookups: {lookups / per_query * 1000:7.2f} ms/group ({lookups / joined:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
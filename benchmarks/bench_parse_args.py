@@ -0,0 +1,96 @@
+"""
+parse_args: parser built once + flagless fast path vs building an ArgumentParser per message.
+
+    python -m benchmarks.bench_parse_args
+"""
+import argparse
+import contextlib
+import io
+import re
+import shlex
+import timeit
+
+from benchmarks._bootstrap import bootstrap
+
+bootstrap()
+
+from src.plugins.gokz.core.command_helper import parse_args  # noqa: E402
+from src.plugins.gokz.core.steam_user import convert_steamid  # noqa: E402
+
+MESSAGES = [
+    "",
+    "kz_ladderall",
+    "ladder",
+    "-m s",
+    "-m v -u",
+    "kz_hb_fafnir -m k",
+    "-q 986668916 -m v",
+    "-s 1061976400 -u",
+    "STEAM_1:0:530988200",
+    "76561198222767300 -m skz",
+    "all -m kzt",
+    "--mode=vnl --update",
+    "'kz lego' -M kz_lego",
+    "-x",
+    "-m",
+    "a -m s b",
+    '"unterminated',
+]
+
+
+def legacy_parse_args(text: str) -> dict:
+    steamid64_pattern = re.compile(r"7656119\d{10}")
+    steamid_pattern = re.compile(r"STEAM_[0-1]:[0-1]:\d+")
+
+    parser = argparse.ArgumentParser(description='Parse arguments from a text string.')
+    parser.add_argument('args', nargs='*', help='Positional arguments before the flags')
+    parser.add_argument('-M', '--map_name', type=str, help='Name of the map')
+    parser.add_argument('-m', '--mode', type=str, help='KZ模式')
+    parser.add_argument('-s', '--steamid', type=str, help='Steam ID')
+    parser.add_argument('-q', '--qid', type=str, help='QQ ID')
+    parser.add_argument('-u', '--update', action='store_true', help='Update flag')
+
+    try:
+        args = shlex.split(text)
+        parsed_args = parser.parse_args(args)
+        for arg in parsed_args.args:
+            if steamid64_pattern.match(arg):
+                parsed_args.steamid = arg
+                break
+            elif steamid_pattern.match(arg):
+                parsed_args.steamid = convert_steamid(arg, 64)
+                break
+        result = vars(parsed_args)
+        result['args'] = tuple(result['args'])
+        return result
+    except argparse.ArgumentError as e:
+        return {'error': f'Argument error: {str(e)}'}
+    except SystemExit:
+        return {'error': '未指定参数'}
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def as_dict(parsed) -> dict:
+    if parsed.error:
+        return {'error': parsed.error}
+    return {name: getattr(parsed, name) for name in ('args', 'map_name', 'mode', 'steamid', 'qid', 'update')}
+
+
+def main():
+    # the legacy parser prints usage to stderr on every error
+    with contextlib.redirect_stderr(io.StringIO()):
+        mismatches = [m for m in MESSAGES if as_dict(parse_args(m)) != legacy_parse_args(m)]
+        print(f"messages: {len(MESSAGES)}, result mismatches: {mismatches or 0}")
+
+        number = 200
+        legacy = timeit.timeit(lambda: [legacy_parse_args(m) for m in MESSAGES], number=number)
+        current = timeit.timeit(lambda: [parse_args(m) for m in MESSAGES], number=number)
+
+    per_message = number * len(MESSAGES)
+    print(f"legacy:  {legacy / per_message * 1e6:7.1f} us/message")
+    print(f"current: {current / per_message * 1e6:7.1f} us/message ({legacy / current:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+search_map: indexed lookup vs the original linear scan + difflib.
+
+    python -m benchmarks.bench_search_map
+"""
+import difflib
+import random
+import timeit
+
+from benchmarks._bootstrap import bootstrap
+
+bootstrap()
+
+from src.plugins.gokz.core.config import MAP_TIERS  # noqa: E402
+from src.plugins.gokz.core.kreedz import search_map  # noqa: E402
+from src.plugins.gokz.core.map_search import MapSearchIndex  # noqa: E402
+
+
+def legacy_search_map(map_name, threshold=0.2) -> list:
+    exact_or_substring_matches = [
+        map_ for map_ in MAP_TIERS.keys() if map_name in map_
+    ]
+    if exact_or_substring_matches:
+        exact_or_substring_matches.sort(key=lambda x: (x != map_name, x))
+        return exact_or_substring_matches
+    return difflib.get_close_matches(map_name, MAP_TIERS.keys(), n=5, cutoff=threshold)
+
+
+def make_queries(seed=0):
+    rng = random.Random(seed)
+    names = sorted(MAP_TIERS)
+    exact = rng.sample(names, 200)
+    substrings = []
+    for name in rng.sample(names, 200):
+        start = rng.randrange(0, max(1, len(name) - 4))
+        substrings.append(name[start:start + rng.randint(3, 8)])
+    typos = []
+    for name in rng.sample(names, 100):
+        i = rng.randrange(len(name))
+        typos.append(name[:i] + name[i + 1:] + rng.choice('aeiou'))
+    return exact, substrings, typos
+
+
+def main():
+    exact, substrings, typos = make_queries()
+
+    mismatches = [q for q in exact + substrings if search_map(q) != legacy_search_map(q)]
+    print(f"exact/substring queries: {len(exact) + len(substrings)}, result mismatches: {len(mismatches)}")
+    fuzzy_same_top = sum(
+        1 for q in typos if (search_map(q)[:1] or [None]) == (legacy_search_map(q)[:1] or [None])
+    )
+    print(f"fuzzy queries: {len(typos)}, same top result as legacy: {fuzzy_same_top}")
+
+    build = timeit.timeit(lambda: MapSearchIndex(MAP_TIERS.keys()), number=5) / 5
+    print(f"index build ({len(MAP_TIERS)} maps): {build * 1000:.1f} ms")
+
+    for label, queries in (("exact", exact), ("substring", substrings), ("fuzzy", typos)):
+        legacy = timeit.timeit(lambda: [legacy_search_map(q) for q in queries], number=3) / 3 / len(queries)
+
+        def cold():
+            index = MapSearchIndex(MAP_TIERS.keys(), memo_size=0)
+            return timeit.timeit(lambda: [index.search(q) for q in queries], number=3) / 3 / len(queries)
+
+        [search_map(q) for q in queries]
+        warm = timeit.timeit(lambda: [search_map(q) for q in queries], number=3) / 3 / len(queries)
+        print(f"{label:>10}: legacy {legacy * 1e6:9.1f} us | index {cold() * 1e6:8.1f} us | memoized {warm * 1e6:6.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Write the fixture files the benchmark suite reads.
+
+The data has the shape of api.gokz.top responses (records, leaderboard entries) and of the
+command text players send, but is generated from a fixed seed so the suite runs offline and
+every machine times the same input. Only re-run this when the input shape needs to change,
+otherwise old results stop being comparable.
+
+    python -m benchmarks.make_fixtures
+"""
+import json
+import random
+from datetime import datetime, timedelta
+
+from benchmarks._bootstrap import ROOT, FIXTURES
+
+SEED = 20241018
+PLAYER = {'steam_id': 'STEAM_1:0:530988200', 'player_name': 'Exa'}
+SERVERS = [
+    (1, 'GOKZ.TOP | KZT #1'), (2, 'GOKZ.TOP | KZT #2'), (3, 'GOKZ.TOP | SKZ/VNL'),
+    (4, 'KZ-Asia | Tier 1-3'), (5, 'KZ-Asia | Tier 4-7'), (6, 'Bonk.KZ | Global'),
+    (7, 'xKZ | Hard Maps'), (8, 'KZ China | 新手服'), (9, 'KZ China | 高难服'), (10, 'Bhop Heaven KZ'),
+]
+# every spelling `format_kzmode` accepts
+MODES = ['kz_timer', 'kzt', 'k', 'kz_simple', 'skz', 's', 'kz_vanilla', 'vnl', 'v', 0, 1, 2, '0', '1', '2']
+
+
+def _points(tier: int, time: float, best: float, pro: bool) -> int:
+    points = max(0, round(1000 * (best / time) ** (1 + tier / 4)))
+    return points if pro else min(points, 990)
+
+
+def make_records(rng: random.Random, maps: list[dict], count=1200) -> list[dict]:
+    """a full kz_timer history: most maps finished once or twice, a few grinded dozens of times"""
+    grinded = rng.sample(maps, 12)
+    attempts = [(map_, rng.randint(20, 60)) for map_ in grinded]
+    while sum(n for _, n in attempts) < count:
+        attempts.append((rng.choice(maps), rng.choice((1, 1, 1, 2, 2, 3, 5))))
+
+    records = []
+    start = datetime(2021, 3, 1)
+    for map_, n in attempts:
+        tier = map_['difficulty']
+        best = rng.uniform(30, 120) * tier
+        when = start + timedelta(minutes=rng.randint(0, 60 * 24 * 900))
+        for _ in range(n):
+            pro = rng.random() < 0.35
+            time = best * rng.uniform(1.0, 3.0)
+            server_id, server_name = rng.choice(SERVERS)
+            records.append({
+                'id': 10_000_000 + len(records),
+                'player_name': PLAYER['player_name'],
+                'steam_id': PLAYER['steam_id'],
+                'server_id': server_id,
+                'map_id': map_['id'],
+                'stage': 0,
+                'mode': 'kz_timer',
+                'time': round(time, 3),
+                'teleports': 0 if pro else rng.randint(1, 40 * tier),
+                'created_on': when.isoformat(timespec='seconds'),
+                'server_name': server_name,
+                'map_name': map_['name'],
+                'tier': tier,
+                'points': _points(tier, time, best, pro),
+            })
+            when += timedelta(minutes=rng.randint(5, 60 * 24 * 3))
+    rng.shuffle(records)
+    return records[:count]
+
+
+def make_leaderboard(rng: random.Random, count=200) -> list[dict]:
+    entries = []
+    for rank in range(1, count + 1):
+        account = rng.randrange(10_000, 600_000_000)
+        count_pro, count_tp = rng.randint(50, 900), rng.randint(100, 1000)
+        entries.append({
+            'steamid': f'STEAM_1:{account % 2}:{account // 2}',
+            'name': f'player{rank}',
+            'pts_skill': round(10 - rank * 0.04 + rng.random() * 0.03, 2),
+            'rank_name': rng.choice(('Legend', 'Master', 'Pro', 'Semipro', 'Expert+')),
+            'most_played_server': rng.choice(SERVERS)[1],
+            'avatar_hash': '%040x' % rng.getrandbits(160),
+            'total_points': rng.randint(200_000, 1_500_000),
+            'count': count_pro + count_tp,
+            'pts_avg': rng.randint(600, 950),
+            'pts_avg_t5': rng.randint(400, 900),
+            'pts_avg_t6': rng.randint(300, 900),
+            'pts_avg_t7': rng.randint(0, 900),
+            'pts_avg_pro': rng.randint(500, 950),
+            'pts_avg_tp': rng.randint(500, 950),
+            'count_t5': rng.randint(0, 300),
+            'count_t6': rng.randint(0, 150),
+            'count_t7': rng.randint(0, 60),
+            'count_p1000_tp': rng.randint(0, 50),
+            'count_p1000_pro': rng.randint(0, 50),
+            'count_p900': rng.randint(0, 500),
+            'count_p800': rng.randint(0, 800),
+            'count_t567_p900': rng.randint(0, 200),
+            'count_t567_p800': rng.randint(0, 300),
+            'count_t567_pro': rng.randint(0, 200),
+            'count_pro': count_pro,
+            'count_tp': count_tp,
+            'updated_on': f'2024-10-{rng.randint(1, 17):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00.{rng.randint(0, 999999):06d}',
+            'rank': rank,
+            'percentage': f'{rank / 1000:.3f}%',
+            'steamid64': str(76561197960265728 + account),
+        })
+    return entries
+
+
+def make_messages(rng: random.Random, maps: list[dict], count=300) -> list[str]:
+    """command arguments in the forms players actually type"""
+    names = [map_['name'] for map_ in maps]
+    templates = [
+        lambda: '',
+        lambda: rng.choice(names),
+        lambda: rng.choice(names)[3:3 + rng.randint(3, 8)],
+        lambda: f"-m {rng.choice(('k', 's', 'v', 'kzt', 'skz', 'vnl'))}",
+        lambda: f"{rng.choice(names)} -m {rng.choice(('k', 's', 'v'))}",
+        lambda: f"-q {rng.randrange(10_000_000, 3_000_000_000)} -m v",
+        lambda: f"-s {rng.randrange(10_000, 600_000_000)} -u",
+        lambda: f"STEAM_1:{rng.randint(0, 1)}:{rng.randrange(10_000, 300_000_000)}",
+        lambda: f"{76561197960265728 + rng.randrange(10_000, 600_000_000)} -m skz",
+        lambda: f"--mode=vnl --update {rng.choice(names)}",
+        lambda: f"'kz lego' -M {rng.choice(names)}",
+        lambda: '-m',
+        lambda: '"unterminated',
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+def make_steamids(rng: random.Random, count=300) -> list:
+    """the id forms `convert_steamid` is called with"""
+    ids = []
+    for _ in range(count):
+        account = rng.randrange(10_000, 600_000_000)
+        ids.append(rng.choice((
+            f'STEAM_1:{account % 2}:{account // 2}',
+            f'STEAM_0:{account % 2}:{account // 2}',
+            str(76561197960265728 + account),
+            76561197960265728 + account,
+            f'[U:1:{account}]',
+            account,
+        )))
+    return ids
+
+
+def main():
+    rng = random.Random(SEED)
+    maps = [map_ for map_ in json.loads((ROOT / 'data' / 'gokz_maps.json').read_text('utf-8')) if map_['validated']]
+
+    fixtures = {
+        'records.json': make_records(rng, maps),
+        'leaderboard.json': make_leaderboard(rng),
+        'messages.json': make_messages(rng, maps),
+        'steamids.json': make_steamids(rng),
+        'modes.json': MODES,
+    }
+    FIXTURES.mkdir(exist_ok=True)
+    for name, data in fixtures.items():
+        with open(FIXTURES / name, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            f.write('\n')
+        print(f"{name}: {len(data)} entries")
+
+
+if __name__ == '__main__':
+    main()
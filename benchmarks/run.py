@@ -0,0 +1,273 @@
+"""
+Microbenchmark suite for the plugin's pure hot paths, timed on the fixtures in `benchmarks/fixtures`.
+
+Each case is run `--repeat` times, every repeat long enough (`--min-time`) to drown out timer
+noise, with the garbage collector off. The fastest repeat is the figure compared between runs:
+on a busy machine noise only ever makes a run slower, never faster.
+Results are written to `benchmarks/results/<timestamp>.json` and compared with
+`benchmarks/results/baseline.json`; a case slower than the baseline by more than `--threshold`
+is flagged and the exit status is 1. Baselines are per machine, create one with `--save-baseline`.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run -k search_map --repeat 9
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks._bootstrap import bootstrap, ROOT, FIXTURES
+
+bootstrap()
+
+from src.plugins.gokz.api.dataclasses import LeaderboardData  # noqa: E402
+from src.plugins.gokz.core.command_helper import parse_args  # noqa: E402
+from src.plugins.gokz.core.config import MAP_TIERS  # noqa: E402
+from src.plugins.gokz.core.formatter import format_gruntime, record_format_time  # noqa: E402
+from src.plugins.gokz.core.kreedz import format_kzmode, search_map  # noqa: E402
+from src.plugins.gokz.core.kz.records import count_servers, progress_history  # noqa: E402
+from src.plugins.gokz.core.map_search import MapSearchIndex  # noqa: E402
+from src.plugins.gokz.core.steam_user import convert_steamid, _convert_steamid  # noqa: E402
+
+RESULTS = Path(__file__).resolve().parent / "results"
+BASELINE = RESULTS / "baseline.json"
+
+CASES = {}
+
+
+def case(name: str):
+    """register `setup() -> (function, operations per call)`"""
+
+    def decorator(setup):
+        CASES[name] = setup
+        return setup
+
+    return decorator
+
+
+def load(name: str):
+    with open(FIXTURES / name, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@case('parse_args')
+def _():
+    messages = load('messages.json')
+    return lambda: [parse_args(message) for message in messages], len(messages)
+
+
+def _map_queries():
+    """exact names, substrings and typos of the maps in the recorded history"""
+    rng = random.Random(0)
+    names = sorted({record['map_name'] for record in load('records.json')})
+    queries = list(names[:100])
+    for name in names[100:200]:
+        start = rng.randrange(0, max(1, len(name) - 4))
+        queries.append(name[start:start + rng.randint(3, 8)])
+    for name in names[200:250]:
+        i = rng.randrange(len(name))
+        queries.append(name[:i] + name[i + 1:] + rng.choice('aeiou'))
+    return queries
+
+
+@case('search_map')
+def _():
+    queries = _map_queries()
+    return lambda: [search_map(query) for query in queries], len(queries)
+
+
+@case('search_map[uncached]')
+def _():
+    queries = _map_queries()
+    index = MapSearchIndex(MAP_TIERS.keys(), memo_size=0)
+    return lambda: [index.search(query) for query in queries], len(queries)
+
+
+@case('format_kzmode')
+def _():
+    calls = [(mode, form) for mode in load('modes.json') for form in ('full', 'mid', 'num')]
+    return lambda: [format_kzmode(mode, form) for mode, form in calls], len(calls)
+
+
+@case('convert_steamid')
+def _():
+    steamids = load('steamids.json')
+    return lambda: [convert_steamid(steamid, 64) for steamid in steamids], len(steamids)
+
+
+@case('convert_steamid[uncached]')
+def _():
+    steamids = load('steamids.json')
+
+    def run():
+        _convert_steamid.cache_clear()
+        return [convert_steamid(steamid, 64) for steamid in steamids]
+
+    return run, len(steamids)
+
+
+@case('format_gruntime')
+def _():
+    times = [record['time'] for record in load('records.json')]
+    return lambda: [(format_gruntime(t), format_gruntime(t, True)) for t in times], len(times) * 2
+
+
+@case('record_format_time')
+def _():
+    created_on = [record['created_on'] for record in load('records.json')]
+    return lambda: [record_format_time(value) for value in created_on], len(created_on)
+
+
+@case('count_servers')
+def _():
+    records = load('records.json')
+    return lambda: count_servers(records, limit=10), 1
+
+
+@case('LeaderboardData.from_dict')
+def _():
+    entries = load('leaderboard.json')
+    return lambda: [LeaderboardData.from_dict(entry) for entry in entries], len(entries)
+
+
+@case('mp_progress')
+def _():
+    by_map = defaultdict(list)
+    for record in load('records.json'):
+        by_map[record['map_name']].append(record)
+    # what /mp does with one map's records before formatting them
+    maps = list(by_map.values())
+
+    def run():
+        for records in maps:
+            history, completions = progress_history(records)
+            [record for record in history if record['teleports'] > 0]
+            [record for record in history if record['teleports'] == 0]
+
+    return run, len(maps)
+
+
+def measure(function, operations: int, repeat: int, min_time: float) -> dict:
+    """seconds per operation: the fastest and the median of `repeat` timed batches"""
+    function()  # warm up memos and lazy imports
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            timings.append((time.perf_counter() - start) / number / operations)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {'best': min(timings), 'median': statistics.median(timings), 'number': number, 'operations': operations}
+
+
+def _git_revision() -> str | None:
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """names of the cases that got slower than `threshold` allows"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous and result['best'] > previous['best'] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the microbenchmarks and compare them with the baseline.')
+    parser.add_argument('-k', dest='filter', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=7, help='timed batches per case')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timed batch')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown that counts as a regression')
+    parser.add_argument('--baseline', type=Path, default=BASELINE, help='results file to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--no-save', action='store_true', help='do not write a results file')
+    options = parser.parse_args(argv)
+
+    names = [name for name in CASES if not options.filter or options.filter in name]
+    if not names:
+        parser.error(f"no case matches {options.filter!r}, cases: {', '.join(CASES)}")
+
+    baseline = {}
+    if options.baseline.exists():
+        baseline = json.loads(options.baseline.read_text('utf-8'))['results']
+
+    results = {}
+    print(f"{'case':<28}{'best us/op':>12}{'median':>10}{'baseline':>10}{'change':>9}")
+    for name in names:
+        function, operations = CASES[name]()
+        result = results[name] = measure(function, operations, options.repeat, options.min_time)
+        line = f"{name:<28}{result['best'] * 1e6:>12.3f}{result['median'] * 1e6:>10.3f}"
+        if previous := baseline.get(name):
+            change = result['best'] / previous['best'] - 1
+            flag = '  REGRESSION' if change > options.threshold else ''
+            line += f"{previous['best'] * 1e6:>10.3f}{change:>+9.1%}{flag}"
+        print(line)
+
+    run = {
+        'created_on': datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()} {platform.node()}",
+        'repeat': options.repeat,
+        'min_time': options.min_time,
+        'results': results,
+    }
+    if not options.no_save:
+        RESULTS.mkdir(exist_ok=True)
+        path = RESULTS / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+        path.write_text(json.dumps(run, indent=2), 'utf-8')
+        print(f"results written to {path.relative_to(ROOT)}")
+    if options.save_baseline:
+        RESULTS.mkdir(exist_ok=True)
+        if options.baseline.exists():
+            # a partial run only replaces the cases it ran
+            run['results'] = {**baseline, **results}
+        options.baseline.write_text(json.dumps(run, indent=2), 'utf-8')
+        print(f"baseline written to {options.baseline}")
+        return 0
+
+    if not baseline:
+        print("no baseline to compare with, create one with --save-baseline")
+        return 0
+    regressions = compare(results, baseline, options.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {options.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"no regressions over {options.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,7 +6,10 @@ from nonebot import logger
 from nonebot.log import default_format
 from nonebot.plugin import PluginMetadata
 
+from .api.helper import init_http_session, close_http_session
+from .api.leaderboard_refresh import leaderboard_refresher
 from .config import Config
+from .db.db import async_engine
 
 __plugin_meta__ = PluginMetadata(
     name="gokz",
@@ -18,6 +21,13 @@ __plugin_meta__ = PluginMetadata(
 config = get_plugin_config(Config)
 logger.add("error.log", level="ERROR", format=default_format, rotation="1 week")
 
+driver = nonebot.get_driver()
+driver.on_startup(init_http_session)
+driver.on_startup(leaderboard_refresher.start)
+driver.on_shutdown(leaderboard_refresher.stop)
+driver.on_shutdown(close_http_session)
+driver.on_shutdown(async_engine.dispose)
+
 sub_plugins = nonebot.load_plugins(
     str(Path(__file__).parent.joinpath("plugins").resolve())
 )
@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+
+# TTLs in seconds, per endpoint family
+TTL_WORLD_RECORD = 5 * 60
+TTL_PERSONAL_BEST = 2 * 60
+TTL_GLOBAL_STATS = 5 * 60
+TTL_BANS = 6 * 60 * 60
+TTL_MAP_LIST = 24 * 60 * 60
+TTL_LEADERBOARD = 5 * 60
+TTL_RECORDS = 5 * 60
+TTL_PLAYER_SEARCH = 60 * 60
+
+# How long past its TTL an entry may still be served while it is refreshed in the background
+STALE_GRACE_RATIO = 1.0
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    ttl: float
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+    @property
+    def fresh(self) -> bool:
+        return self.age <= self.ttl
+
+    @property
+    def servable(self) -> bool:
+        """fresh, or stale but still inside the grace window"""
+        return self.age <= self.ttl * (1 + STALE_GRACE_RATIO)
+
+
+class ResponseCache:
+    """Bounded LRU of decoded JSON responses with per-entry TTL"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(url: str, params: dict | None = None) -> str:
+        """normalize url + params so that ordering and value types don't split the cache"""
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if params:
+            query += [(str(k), str(v)) for k, v in params.items() if v is not None]
+        query.sort()
+        return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ''))
+
+    def get(self, key: str) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if not entry.servable:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if entry.fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+
+    def set(self, key: str, value, ttl: float):
+        self._entries[key] = CacheEntry(value, time.monotonic(), ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache()
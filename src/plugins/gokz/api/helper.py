@@ -1,19 +1,113 @@
 import asyncio
 
 import aiohttp
+from nonebot import logger
 
+from .cache import response_cache
+from .resilience import ATTEMPT_SHARE, RETRY_STATUSES, UpstreamStatusError, resilient_get
+from ..core.singleflight import SingleFlight
 
-async def fetch_json(*urls, params=None, timeout=15):
-    async def fetch(session_, url_):
-        async with session_.get(url_, params=params) as response:
-            return await response.json()
+# One pooled session for the whole process, so repeated commands reuse
+# keep-alive connections instead of paying a TCP+TLS handshake each time.
+_session: aiohttp.ClientSession | None = None
+
+CONNECTOR_LIMIT = 100
+CONNECTOR_LIMIT_PER_HOST = 10
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+
+
+async def init_http_session():
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTOR_LIMIT,
+            limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+
+async def close_http_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """return the shared session, opening it lazily if the driver hasn't started it yet"""
+    if _session is None or _session.closed:
+        return await init_http_session()
+    return _session
+
+
+# identical GETs in flight at the same time share one upstream request
+inflight_requests = SingleFlight()
+
+# keys currently being refreshed in the background, so a stale entry is only revalidated once
+_revalidating: dict[str, asyncio.Task] = {}
+
+
+async def _revalidate(key, request, ttl):
+    try:
+        data, ok = await request()
+        if ok:
+            response_cache.set(key, data, ttl)
+    except Exception as e:
+        logger.warning(f"Background refresh of {key} failed: {e!r}")
+    finally:
+        _revalidating.pop(key, None)
+
+
+async def fetch_json(*urls, params=None, timeout=15, ttl=None, force_update=False, attempt_share=ATTEMPT_SHARE):
+    """
+    GET one or more urls and decode the JSON bodies.
+    Concurrent calls for the same url + params share a single request.
+    Each request runs under the host's circuit breaker with retries and hedging (see `resilience`),
+    `timeout` bounds all attempts together; pass `attempt_share=1` for large downloads that need
+    all of it in one attempt.
+    With `ttl` set, responses are served from `response_cache`; an entry past its ttl
+    is still returned once while it is refreshed in the background.
+    `force_update` skips the cache lookup but still stores the new response.
+    """
+    session = await get_http_session()
+
+    async def get(url_):
+        async def send(attempt_timeout):
+            client_timeout = aiohttp.ClientTimeout(total=attempt_timeout)
+            async with session.get(url_, params=params, timeout=client_timeout) as response:
+                if response.status in RETRY_STATUSES:
+                    raise UpstreamStatusError(response.status)
+                return await response.json(), response.ok
+
+        return await resilient_get(url_, send, timeout, attempt_share=attempt_share)
+
+    async def request(url_, key_):
+        return await inflight_requests.do(key_, lambda: get(url_))
+
+    async def fetch(url_):
+        key = response_cache.make_key(url_, params)
+        if ttl is None:
+            return (await request(url_, key))[0]
+
+        if not force_update:
+            entry = response_cache.get(key)
+            if entry is not None:
+                if not entry.fresh and key not in _revalidating:
+                    _revalidating[key] = asyncio.create_task(_revalidate(key, lambda: request(url_, key), ttl))
+                return entry.value
+
+        data, ok = await request(url_, key)
+        if ok:
+            response_cache.set(key, data, ttl)
+        return data
 
     if len(urls) == 1:
-        url = urls[0]
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-            return await fetch(session, url)
+        return await fetch(urls[0])
     else:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-            tasks = [fetch(session, url) for url in urls]
-            responses = await asyncio.gather(*tasks)
-            return tuple(responses)
+        tasks = [fetch(url) for url in urls]
+        responses = await asyncio.gather(*tasks)
+        return tuple(responses)
@@ -1,32 +1,36 @@
-import json
 import subprocess
-from datetime import datetime
 from pathlib import Path
 
 from src.plugins.gokz.core.kreedz import format_kzmode
+from src.plugins.gokz.core.map_catalog import map_catalog
 from src.plugins.gokz.core.steam_user import convert_steamid
+from ..api.cache import TTL_MAP_LIST, TTL_GLOBAL_STATS, TTL_PERSONAL_BEST, TTL_BANS, TTL_WORLD_RECORD
 from ..api.helper import fetch_json
 
 GLOBAL_API_URL = "https://kztimerglobal.com/api/v2.0/"
 
 
-async def update_map_data():
+async def update_map_data(force_update=False) -> tuple[set, set]:
+    """
+    refresh the map catalog in place, returns the (added, removed) map names.
+    Raises ValueError and keeps the current catalog if upstream didn't answer with a map list.
+    """
     url = f"{GLOBAL_API_URL}maps?limit=2000"
-    save_path = Path("data/gokz_maps_data.json")
-    save_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # fetch and save json
-    data = await fetch_json(url)
-    with save_path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # fetch and swap in the new map list, only a list that parsed is written to disk
+    data = await fetch_json(url, ttl=TTL_MAP_LIST, force_update=force_update)
+    added, removed = map_catalog.replace(data)
+    map_catalog.save(data)
 
     # git pull the map-images repo
     repo_path = Path("data/map-images")
     if repo_path.exists():
         subprocess.run(["git", "pull"], cwd=repo_path, check=True)
 
+    return added, removed
 
-async def fetch_global_stats(steamid64, mode_str, has_tp=True) -> list:
+
+async def fetch_global_stats(steamid64, mode_str, has_tp=True, force_update=False) -> list:
     steamid64 = convert_steamid(steamid64, 64)
     params = {
         'steamid64': steamid64,
@@ -36,26 +40,13 @@ async def fetch_global_stats(steamid64, mode_str, has_tp=True) -> list:
         'limit': 10000,
         'has_teleports': str(has_tp).lower(),
     }
-    data = await fetch_json(f"{GLOBAL_API_URL}records/top", params=params)
+    # up to 10000 records, one attempt may need the whole timeout
+    data = await fetch_json(f"{GLOBAL_API_URL}records/top", params=params, ttl=TTL_GLOBAL_STATS,
+                            force_update=force_update, attempt_share=1)
     return data
 
 
-async def fetch_personal_recent(steamid64, mode='kzt'):
-    steamid64 = convert_steamid(steamid64, 64)
-    mode = format_kzmode(mode)
-
-    data_with_tp = await fetch_global_stats(steamid64, mode, True)
-    data_without_tp = await fetch_global_stats(steamid64, mode, False)
-    data = data_with_tp + data_without_tp
-
-    for item in data:
-        item["created_on_datetime"] = datetime.fromisoformat(item["updated_on"])
-    sorted_data = sorted(data, key=lambda x: x["created_on_datetime"], reverse=True)
-
-    return sorted_data[0]
-
-
-async def fetch_personal_best(steamid64, map_name, mode='kzt', has_tp=True):
+async def fetch_personal_best(steamid64, map_name, mode='kzt', has_tp=True, force_update=False):
     steamid64 = convert_steamid(steamid64, 64)
     mode = format_kzmode(mode)
 
@@ -68,14 +59,14 @@ async def fetch_personal_best(steamid64, map_name, mode='kzt', has_tp=True):
     }
 
     url = "https://kztimerglobal.com/api/v2.0/records/top"
-    data = await fetch_json(url, params=params)
+    data = await fetch_json(url, params=params, ttl=TTL_PERSONAL_BEST, force_update=force_update)
     if data:
         return data[0]
     else:
         return None
 
 
-async def fetch_personal_bans(steamid64):
+async def fetch_personal_bans(steamid64, force_update=False):
     steamid64 = convert_steamid(steamid64, 64)
 
     params = {
@@ -83,14 +74,14 @@ async def fetch_personal_bans(steamid64):
     }
 
     url = "https://kztimerglobal.com/api/v2.0/bans"
-    data = await fetch_json(url, params=params)
+    data = await fetch_json(url, params=params, ttl=TTL_BANS, force_update=force_update)
     if data:
         return data
     else:
         return None
 
 
-async def fetch_world_record(map_name, mode='kzt', has_tp=True):
+async def fetch_world_record(map_name, mode='kzt', has_tp=True, force_update=False):
     mode = format_kzmode(mode)
     params = {
         'map_name': map_name,
@@ -100,32 +91,6 @@ async def fetch_world_record(map_name, mode='kzt', has_tp=True):
         'place_top_at_least': 1
     }
 
-    data = await fetch_json(f"{GLOBAL_API_URL}records/top/recent", params=params)
+    data = await fetch_json(f"{GLOBAL_API_URL}records/top/recent", params=params, ttl=TTL_WORLD_RECORD,
+                            force_update=force_update)
     return data[0]
-
-
-async def fetch_personal_purity(steamid64, mode='kzt', exclusive=False) -> dict:
-    server_id = [1683, 1633, 1393]
-
-    steamid64 = convert_steamid(steamid64, 64)
-    mode = format_kzmode(mode)
-
-    data_with_tp = await fetch_global_stats(steamid64, mode, True)
-    data_without_tp = await fetch_global_stats(steamid64, mode, False)
-    data = data_with_tp + data_without_tp
-
-    maps = [f"{record['map_name']} {'TP' if record['teleports'] else 'PRO'}" for record in data if record['server_id'] != 1683]
-
-    if exclusive:
-        count = sum(1 for item in data if item.get('server_id') in server_id)
-    else:
-        count = sum(1 for item in data if item.get('server_id') == server_id[0])
-
-    return {
-        'name': data[0]['player_name'],
-        'steamid64': steamid64,
-        'count': count,
-        'total': len(data),
-        'percentage': count / len(data),
-        'maps': maps,
-    }
@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import aiohttp
+from nonebot import logger
+
+from .helper import get_http_session
+from ..config import LEADERBOARD_REFRESH_URL, LEADERBOARD_REFRESH_CONCURRENCY, LEADERBOARD_REFRESH_DEBOUNCE
+
+
+class LeaderboardRefresher:
+    """
+    Background queue in front of the leaderboard refresh service.
+    A (steamid, mode) that is already queued or being refreshed shares the pending future,
+    and one refreshed less than `debounce` seconds ago returns the previous result right away.
+    `workers` bounds how many refreshes hit the service at the same time.
+    """
+
+    def __init__(self, base_url=LEADERBOARD_REFRESH_URL, workers=LEADERBOARD_REFRESH_CONCURRENCY,
+                 debounce=LEADERBOARD_REFRESH_DEBOUNCE, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.workers = workers
+        self.debounce = debounce
+        self.timeout = timeout
+        self._queue: asyncio.Queue[tuple[str, str]] | None = None
+        self._pending: dict[tuple[str, str], asyncio.Future] = {}
+        self._done: dict[tuple[str, str], tuple[bool, float]] = {}
+        self._tasks: list[asyncio.Task] = []
+        self.refreshed = 0
+        self.failed = 0
+        self.deduplicated = 0
+
+    async def start(self):
+        """startup hook, the workers need the running loop"""
+        self._start_workers()
+
+    def _start_workers(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    def request(self, steamid: str, mode: str = 'kz_timer') -> asyncio.Future:
+        """queue a refresh, the returned future resolves to whether the service accepted it"""
+        self._start_workers()
+        key = (str(steamid), mode)
+
+        if future := self._pending.get(key):
+            self.deduplicated += 1
+            return future
+
+        loop = asyncio.get_running_loop()
+        if done := self._done.get(key):
+            ok, finished_at = done
+            if time.monotonic() - finished_at < self.debounce:
+                self.deduplicated += 1
+                future = loop.create_future()
+                future.set_result(ok)
+                return future
+
+        future = loop.create_future()
+        self._pending[key] = future
+        self._queue.put_nowait(key)
+        return future
+
+    async def refresh(self, steamid: str, mode: str = 'kz_timer', timeout: float = 10) -> bool:
+        """queue a refresh and wait up to `timeout` seconds for it, the refresh keeps going after a timeout"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.request(steamid, mode)), timeout)
+        except asyncio.TimeoutError:
+            logger.info(f"Leaderboard refresh of {steamid} ({mode}) still running after {timeout}s")
+            return False
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            try:
+                ok = await self._put(*key)
+            except Exception as e:
+                logger.warning(f"Leaderboard refresh of {key[0]} ({key[1]}) failed: {e!r}")
+                ok = False
+
+            if ok:
+                self.refreshed += 1
+            else:
+                self.failed += 1
+            self._done[key] = (ok, time.monotonic())
+            self._prune()
+            future = self._pending.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(ok)
+            self._queue.task_done()
+
+    async def _put(self, steamid: str, mode: str) -> bool:
+        session = await get_http_session()
+        url = f'{self.base_url}/{steamid}'
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with session.put(url, params={'mode': mode}, timeout=timeout) as response:
+            return response.ok
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.debounce
+        if len(self._done) > 1024:
+            self._done = {key: done for key, done in self._done.items() if done[1] >= cutoff}
+
+    def stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'pending': len(self._pending),
+            'refreshed': self.refreshed,
+            'failed': self.failed,
+            'deduplicated': self.deduplicated,
+        }
+
+
+leaderboard_refresher = LeaderboardRefresher()
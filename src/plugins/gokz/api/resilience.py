@@ -0,0 +1,203 @@
+import asyncio
+import random
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import aiohttp
+from nonebot import logger
+
+from ..core.metrics import upstream_seconds
+
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.3
+RETRY_MAX_DELAY = 3
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.2
+ATTEMPT_SHARE = 2 / 3
+
+# upstream trouble worth another attempt; 4xx are answers, not failures
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """the host failed too often recently, requests are refused without being sent"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"{host} is unavailable, retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class UpstreamStatusError(aiohttp.ClientError):
+    def __init__(self, status: int):
+        super().__init__(f"upstream answered {status}")
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    closed: requests go through, consecutive failures are counted.
+    open: after `failure_threshold` failures in a row, everything is refused for `open_seconds`.
+    half-open: then a single trial request is let through; success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, host: str, failure_threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+        self.rejected = 0
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.open_seconds:
+            return 'open'
+        return 'half-open'
+
+    def before_request(self) -> bool:
+        """raises CircuitOpenError if the request may not be sent, returns whether it is the half-open trial"""
+        state = self.state
+        if state == 'closed':
+            return False
+        if state == 'half-open' and not self._trial_running:
+            self._trial_running = True
+            return True
+        self.rejected += 1
+        retry_after = max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(self.host, retry_after)
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.host} closed again")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def release(self):
+        """the trial request ended without telling whether the host is healthy"""
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        was_trial = self._trial_running
+        self._trial_running = False
+        if was_trial or self.failures >= self.failure_threshold:
+            if self.opened_at is None or was_trial:
+                logger.warning(f"Circuit for {self.host} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def p95(self) -> float | None:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'p95_ms': round(p95 * 1000) if p95 is not None else None,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(url: str) -> CircuitBreaker:
+    host = urlsplit(url).netloc
+    if host not in _breakers:
+        _breakers[host] = CircuitBreaker(host)
+    return _breakers[host]
+
+
+def circuit_stats() -> dict:
+    return {host: breaker.stats() for host, breaker in _breakers.items()}
+
+
+def backoff(attempt: int) -> float:
+    """full jitter: a random delay up to an exponentially growing cap"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+async def _hedged(request, delay: float | None):
+    """run `request`, and if it hasn't answered after `delay` seconds, race a second copy against it"""
+    if delay is None:
+        return await request()
+
+    tasks = [asyncio.ensure_future(request())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.append(asyncio.ensure_future(request()))
+
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        # let the losers finish cancelling, so nothing is left pending or with an unretrieved exception
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def resilient_get(url: str, send, timeout: float, max_attempts=MAX_ATTEMPTS, hedge=True,
+                        attempt_share=ATTEMPT_SHARE):
+    """
+    Call `send(attempt_timeout)` (one GET) under the host's circuit breaker, within `timeout` seconds overall.
+    Connection errors, timeouts and 429/5xx answers (`send` raises `UpstreamStatusError` for those)
+    are retried with jittered backoff while time is left; with `hedge`, an attempt slower than
+    the host's p95 latency gets a parallel second try (never for the single trial of a half-open circuit).
+    Every attempt but the last gets at most `attempt_share` of `timeout`; large downloads that need
+    the whole budget pass 1, then only a fast failure leaves time for a retry.
+    """
+    breaker = breaker_for(url)
+    deadline = time.monotonic() + timeout
+
+    for attempt in range(max_attempts):
+        trial = breaker.before_request()
+        start = time.monotonic()
+        remaining = deadline - start
+        # the first attempt gets most of the budget, what's left is for a quick retry
+        attempt_timeout = remaining if attempt + 1 == max_attempts else min(remaining, timeout * attempt_share)
+
+        try:
+            # a hedge would be a second request through a circuit that only lets one trial pass
+            p95 = breaker.p95() if hedge and breaker.state == 'closed' else None
+            result = await _hedged(lambda: send(attempt_timeout), max(p95, HEDGE_MIN_DELAY) if p95 else None)
+        except (*TRANSIENT_ERRORS, UpstreamStatusError) as e:
+            upstream_seconds.observe(time.monotonic() - start, host=breaker.host, outcome='error')
+            breaker.record_failure()
+            delay = backoff(attempt)
+            if attempt + 1 >= max_attempts or breaker.state == 'open' or time.monotonic() + delay >= deadline:
+                raise
+            logger.debug(f"GET {url} failed ({e!r}), retry {attempt + 1}/{max_attempts - 1}")
+            await asyncio.sleep(delay)
+        except BaseException:
+            # the host did answer (bad json, cancelled handler...), that says nothing against it;
+            # only the trial holds the half-open slot, a call from before the circuit opened must not free it
+            if trial:
+                breaker.release()
+            raise
+        else:
+            latency = time.monotonic() - start
+            upstream_seconds.observe(latency, host=breaker.host, outcome='ok')
+            breaker.record_success(latency)
+            return result
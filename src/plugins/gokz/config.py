@@ -6,8 +6,41 @@ from dotenv import load_dotenv
 load_dotenv()
 
 STEAM_API_KEY = os.getenv("STEAM_API_KEY")
+CARD_FONT_PATH = os.getenv("CARD_FONT_PATH", "data/gokz/fonts/card.ttf")  # must have CJK glyphs, e.g. NotoSansCJKsc-Regular.otf
+MAX_RENDER_WORKERS = int(os.getenv("MAX_RENDER_WORKERS", 5))  # headless chrome instances rendering at once
+SCREENSHOT_CACHE_MAX_MB = int(os.getenv("SCREENSHOT_CACHE_MAX_MB", 512))
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "png")  # png | png-optimized | webp | jpeg
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", 85))
+LEADERBOARD_REFRESH_URL = os.getenv("LEADERBOARD_REFRESH_URL", "http://localhost:8000/leaderboard")
+LEADERBOARD_REFRESH_CONCURRENCY = int(os.getenv("LEADERBOARD_REFRESH_CONCURRENCY", 4))
+LEADERBOARD_REFRESH_DEBOUNCE = int(os.getenv("LEADERBOARD_REFRESH_DEBOUNCE", 60))
+RANK_LOCAL_MAX_AGE = int(os.getenv("RANK_LOCAL_MAX_AGE", 3600))  # seconds a local leaderboard row is served for
+LEADERBOARD_SYNC_INTERVAL = float(os.getenv("LEADERBOARD_SYNC_INTERVAL", 6))  # hours between full syncs
+LEADERBOARD_SYNC_CONCURRENCY = int(os.getenv("LEADERBOARD_SYNC_CONCURRENCY", 4))
+LEADERBOARD_SYNC_RATE = float(os.getenv("LEADERBOARD_SYNC_RATE", 5))  # upstream requests per second
+# token buckets for commands: burst size and refill per minute, a render costs 3, a big download 2, the rest 1
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", 6))
+ADMISSION_USER_PER_MINUTE = float(os.getenv("ADMISSION_USER_PER_MINUTE", 12))
+ADMISSION_GROUP_BURST = float(os.getenv("ADMISSION_GROUP_BURST", 30))
+ADMISSION_GROUP_PER_MINUTE = float(os.getenv("ADMISSION_GROUP_PER_MINUTE", 60))
 
 
 class Config(BaseModel):
     """Plugin Config Here"""
     steam_api_key: str = STEAM_API_KEY
+    card_font_path: str = CARD_FONT_PATH
+    max_render_workers: int = MAX_RENDER_WORKERS
+    screenshot_cache_max_mb: int = SCREENSHOT_CACHE_MAX_MB
+    screenshot_format: str = SCREENSHOT_FORMAT
+    screenshot_quality: int = SCREENSHOT_QUALITY
+    leaderboard_refresh_url: str = LEADERBOARD_REFRESH_URL
+    leaderboard_refresh_concurrency: int = LEADERBOARD_REFRESH_CONCURRENCY
+    leaderboard_refresh_debounce: int = LEADERBOARD_REFRESH_DEBOUNCE
+    rank_local_max_age: int = RANK_LOCAL_MAX_AGE
+    leaderboard_sync_interval: float = LEADERBOARD_SYNC_INTERVAL
+    leaderboard_sync_concurrency: int = LEADERBOARD_SYNC_CONCURRENCY
+    leaderboard_sync_rate: float = LEADERBOARD_SYNC_RATE
+    admission_user_burst: float = ADMISSION_USER_BURST
+    admission_user_per_minute: float = ADMISSION_USER_PER_MINUTE
+    admission_group_burst: float = ADMISSION_GROUP_BURST
+    admission_group_per_minute: float = ADMISSION_GROUP_PER_MINUTE
@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import aiohttp
+from nonebot import get_driver, logger
+from nonebot.adapters import Event
+from nonebot.matcher import current_matcher
+
+from src.plugins.gokz.config import (
+    ADMISSION_USER_BURST, ADMISSION_USER_PER_MINUTE, ADMISSION_GROUP_BURST, ADMISSION_GROUP_PER_MINUTE,
+    MAX_RENDER_WORKERS,
+)
+
+
+class Rejected(Exception):
+    """the command was turned away, the message is meant for the user"""
+
+
+class TokenBucket:
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float) -> float:
+        """take `cost` tokens, returns 0 on success or the seconds until there are enough"""
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate if self.rate else float('inf')
+
+    def refund(self, cost: float):
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+@dataclass
+class CommandClass:
+    """
+    Commands that share one concurrency limit.
+    At most `concurrency` run at once, at most `max_queue` wait for a slot, anything beyond that
+    is rejected straight away. `cost` is what one call takes out of the user's and group's buckets.
+    """
+    name: str
+    concurrency: int
+    max_queue: int
+    cost: float = 1
+    max_wait: float = 30
+
+    def __post_init__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+
+
+# Each class has its own slots, so cheap lookups never queue behind renders or big downloads.
+RENDER = CommandClass('render', concurrency=MAX_RENDER_WORKERS, max_queue=10, cost=3, max_wait=60)
+HEAVY = CommandClass('heavy', concurrency=4, max_queue=20, cost=2)
+LIGHT = CommandClass('light', concurrency=16, max_queue=64, cost=1, max_wait=10)
+
+BUSY_MESSAGE = "客服小祥忙不过来了, 请稍后再试"
+UPSTREAM_FAILED_MESSAGE = "获取数据失败，请稍后再试。"
+
+
+class AdmissionControl:
+    """token buckets per QQ user and per group in front of the per-class concurrency limits"""
+
+    def __init__(self, user_burst=ADMISSION_USER_BURST, user_per_minute=ADMISSION_USER_PER_MINUTE,
+                 group_burst=ADMISSION_GROUP_BURST, group_per_minute=ADMISSION_GROUP_PER_MINUTE, max_buckets=10000):
+        self.user_limits = (user_burst, user_per_minute)
+        self.group_limits = (group_burst, group_per_minute)
+        self.max_buckets = max_buckets
+        self._buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+        self.classes = {command_class.name: command_class for command_class in (RENDER, HEAVY, LIGHT)}
+
+    def _bucket(self, kind: str, key: str, limits: tuple) -> TokenBucket:
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            bucket = self._buckets[kind, key] = TokenBucket(*limits)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end((kind, key))
+        return bucket
+
+    def _charge(self, event: Event, cost: float) -> list[TokenBucket]:
+        """take tokens from the user's and the group's bucket, or from neither"""
+        user_id = event.get_user_id()
+        if user_id in get_driver().config.superusers:
+            return []
+
+        charged = []
+        buckets = [("你的指令", self._bucket('user', user_id, self.user_limits))]
+        if group_openid := getattr(event, 'group_openid', None):
+            buckets.append(("本群指令", self._bucket('group', group_openid, self.group_limits)))
+
+        for label, bucket in buckets:
+            retry_after = bucket.take(cost)
+            if retry_after:
+                for taken in charged:
+                    taken.refund(cost)
+                raise Rejected(f"{label}太频繁了, 请{max(1, round(retry_after))}秒后再试")
+            charged.append(bucket)
+        return charged
+
+    @asynccontextmanager
+    async def admit(self, event: Event, command_class: CommandClass):
+        try:
+            charged = self._charge(event, command_class.cost)
+        except Rejected:
+            command_class.throttled += 1
+            raise
+
+        if command_class.waiting >= command_class.max_queue:
+            for bucket in charged:
+                bucket.refund(command_class.cost)
+            command_class.rejected += 1
+            raise Rejected(BUSY_MESSAGE)
+
+        command_class.waiting += 1
+        try:
+            await asyncio.wait_for(command_class._semaphore.acquire(), command_class.max_wait)
+        except asyncio.TimeoutError:
+            for bucket in charged:
+                bucket.refund(command_class.cost)
+            command_class.rejected += 1
+            raise Rejected(BUSY_MESSAGE)
+        finally:
+            command_class.waiting -= 1
+
+        command_class.admitted += 1
+        command_class.running += 1
+        try:
+            yield
+        finally:
+            command_class.running -= 1
+            command_class._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                'running': command_class.running,
+                'waiting': command_class.waiting,
+                'admitted': command_class.admitted,
+                'rejected': command_class.rejected,
+                'throttled': command_class.throttled,
+            }
+            for name, command_class in self.classes.items()
+        }
+
+
+admission_control = AdmissionControl()
+
+
+@asynccontextmanager
+async def admitted(event: Event, command_class: CommandClass):
+    """
+    `admission_control.admit` for handlers that only know the command's class once they've
+    looked at it, a rejected call is answered with the reason instead.
+    Upstream failures the handler didn't deal with (retries used up, open circuit) get a reply too.
+    """
+    try:
+        async with admission_control.admit(event, command_class):
+            yield
+    except Rejected as e:
+        logger.info(f"{command_class.name} command from {event.get_user_id()} rejected: {e}")
+        await current_matcher.get().finish(str(e))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"{command_class.name} command from {event.get_user_id()} failed upstream: {e!r}")
+        await current_matcher.get().finish(UPSTREAM_FAILED_MESSAGE)
+
+
+def admission(command_class: CommandClass):
+    """handler decorator: run the whole handler under `admitted`"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            event = next((value for value in kwargs.values() if isinstance(value, Event)), None)
+            if event is None:
+                return await func(*args, **kwargs)
+            async with admitted(event, command_class):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -4,11 +4,13 @@ import re
 from dataclasses import dataclass, field, asdict
 from typing import Optional, Tuple
 
-from sqlmodel import Session
+from nonebot import logger
 
-from src.plugins.gokz.db.db import engine
-from src.plugins.gokz.db.models import User
+from src.plugins.gokz.db.crud import remember_group_member
+from src.plugins.gokz.db.db import async_session
+from src.plugins.gokz.db.user_cache import user_cache
 from src.plugins.gokz.core.kreedz import format_kzmode
+from src.plugins.gokz.core.metrics import command_db_seconds
 from src.plugins.gokz.core.steam_user import convert_steamid
 
 
@@ -25,79 +27,152 @@ class CommandData:
 
     def __init__(self, event, args):
         self.qid = event.get_user_id()
-        parsed_args = parse_args(args.extract_plain_text())
-        if 'error' in parsed_args:
-            self.error = parsed_args['error']
+        self._event = event
+        self._parsed_args = parse_args(args.extract_plain_text())
+        if self._parsed_args.error:
+            self.error = self._parsed_args.error
             print(f"Error during argument parsing: {self.error}")
-            return
 
-        with Session(engine) as session:
-            user = session.get(User, self.qid)  # NOQA
+    @classmethod
+    async def create(cls, event, args) -> "CommandData":
+        """parse the command text, then resolve the users it refers to"""
+        cd = cls(event, args)
+        with command_db_seconds.time():
+            await _remember_group_member(event)
+            if not cd.error:
+                await cd._resolve_users()
+        return cd
+
+    async def _resolve_users(self):
+        parsed_args = self._parsed_args
+        user = await user_cache.get(self.qid)
+
+        if not user or not user.steamid:
+            self.error = '客服小祥温馨提示您: 请先 /bind steamid'
+            print(self.error)
+            return
 
-            if not user or not user.steamid:
-                self.error = '客服小祥温馨提示您: 请先 /bind steamid'
-                print(self.error)
+        qid = parsed_args.qid
+        if not qid:
+            at_msg = self._event.get_message().copy()
+            for segment in at_msg:
+                if segment.type == 'at':
+                    qid = segment.data['qq']
+                    break
+
+        if qid:
+            user2 = await user_cache.get(qid)
+            if not user2 or not user2.steamid:
+                self.error = "你指定的用户未绑定steamid"
                 return
+            self.steamid = user2.steamid
+            self.steamid2 = user.steamid
+        else:
+            self.steamid = parsed_args.steamid if parsed_args.steamid else user.steamid
+            self.steamid2 = user.steamid if parsed_args.steamid else None
 
-            qid = parsed_args.get('qid')
-            if not qid:
-                at_msg = event.get_message().copy()
-                for segment in at_msg:
-                    if segment.type == 'at':
-                        qid = segment.data['qq']
-                        break
-
-            if qid:
-                user2 = session.get(User, qid)
-                if not user2 or not user2.steamid:
-                    self.error = "你指定的用户未绑定steamid"
-                self.steamid = user2.steamid
-                self.steamid2 = user.steamid
-            else:
-                self.steamid = parsed_args.get('steamid') if parsed_args.get('steamid') else user.steamid
-                self.steamid2 = user.steamid if parsed_args.get('steamid') else None
-
-        self.mode = format_kzmode(parsed_args.get('mode', user.mode)) if parsed_args.get('mode') else user.mode
-        self.map_name = parsed_args.get('map_name', "")
-        self.update = parsed_args.get('update', False)
-        self.args = parsed_args.get('args', ())
+        self.mode = format_kzmode(parsed_args.mode) if parsed_args.mode else user.mode
+        self.map_name = parsed_args.map_name
+        self.update = parsed_args.update
+        self.args = parsed_args.args
 
     def to_dict(self):
         return asdict(self)
 
 
-def parse_args(text: str) -> dict:
-    steamid64_pattern = re.compile(r"7656119\d{10}")
-    steamid_pattern = re.compile(r"STEAM_[0-1]:[0-1]:\d+")
+# (group_openid, qid) pairs already written since startup, so a member costs one write per restart
+_known_group_members: set[tuple[str, str]] = set()
+
+
+async def _remember_group_member(event):
+    """QQ 官方接口拿不到群成员列表, 只能记下在群里用过指令的人, 给 /群排名 用"""
+    group_openid = getattr(event, 'group_openid', None)
+    if not group_openid:
+        return
+    key = (group_openid, event.get_user_id())
+    if key in _known_group_members:
+        return
+    try:
+        async with async_session() as session:
+            await remember_group_member(session, *key)
+        _known_group_members.add(key)
+    except Exception as e:
+        logger.warning(f"Recording group member {key} failed: {e!r}")
+
+
+STEAMID64_PATTERN = re.compile(r"7656119\d{10}")
+STEAMID_PATTERN = re.compile(r"STEAM_[0-1]:[0-1]:\d+")
+
+# shlex.split only needs to run when the text has quoting or escapes
+_SHLEX_CHARS = re.compile(r"""['"\\]""")
+_WHITESPACE = re.compile(r"[ \t\r\n]+")
+
 
-    parser = argparse.ArgumentParser(description='Parse arguments from a text string.')
+@dataclass(slots=True)
+class ParsedArgs:
+    args: Tuple = ()
+    map_name: Optional[str] = None
+    mode: Optional[str] = None
+    steamid: Optional[str | int] = None
+    qid: Optional[str] = None
+    update: bool = False
+    error: Optional[str] = None
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    """raises instead of printing usage and calling sys.exit"""
+
+    def error(self, message):
+        raise argparse.ArgumentError(None, message)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = _ArgumentParser(description='Parse arguments from a text string.', add_help=False)
     parser.add_argument('args', nargs='*', help='Positional arguments before the flags')
     parser.add_argument('-M', '--map_name', type=str, help='Name of the map')
     parser.add_argument('-m', '--mode', type=str, help='KZ模式')
     parser.add_argument('-s', '--steamid', type=str, help='Steam ID')
     parser.add_argument('-q', '--qid', type=str, help='QQ ID')
     parser.add_argument('-u', '--update', action='store_true', help='Update flag')
+    return parser
+
+
+_parser = _build_parser()
+
 
+def parse_args(text: str) -> ParsedArgs:
     try:
-        args = shlex.split(text)
-        parsed_args = parser.parse_args(args)
+        if _SHLEX_CHARS.search(text):
+            tokens = shlex.split(text)
+        else:
+            tokens = [token for token in _WHITESPACE.split(text) if token]
+
+        if '-' in text:
+            namespace = _parser.parse_args(tokens)
+            result = ParsedArgs(
+                args=tuple(namespace.args),
+                map_name=namespace.map_name,
+                mode=namespace.mode,
+                steamid=namespace.steamid,
+                qid=namespace.qid,
+                update=namespace.update,
+            )
+        else:
+            # no flags at all, everything is positional
+            result = ParsedArgs(args=tuple(tokens))
 
         # Search for steamid64 or steamid in the positional arguments
-        for arg in parsed_args.args:
-            if steamid64_pattern.match(arg):
-                parsed_args.steamid = arg  # Treat as steamid64
+        for arg in result.args:
+            if STEAMID64_PATTERN.match(arg):
+                result.steamid = arg  # Treat as steamid64
                 break
-            elif steamid_pattern.match(arg):
-                parsed_args.steamid = convert_steamid(arg, 64)  # Convert to steamid64
+            elif STEAMID_PATTERN.match(arg):
+                result.steamid = convert_steamid(arg, 64)  # Convert to steamid64
                 break
 
-        result = vars(parsed_args)
-        result['args'] = tuple(result['args'])
         return result
 
-    except argparse.ArgumentError as e:
-        return {'error': f'Argument error: {str(e)}'}
-    except SystemExit:
-        return {'error': f'未指定参数'}
+    except argparse.ArgumentError:
+        return ParsedArgs(error='未指定参数')
     except Exception as e:
-        return {'error': str(e)}
+        return ParsedArgs(error=str(e))
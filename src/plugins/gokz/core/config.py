@@ -1,10 +1,4 @@
-import json
+from src.plugins.gokz.core.map_catalog import map_catalog
 
-with open("data/gokz_maps.json", "r", encoding="utf-8") as f:
-    maps_data = json.load(f)
-
-MAP_TIERS = {
-    map_info["name"]: map_info["difficulty"]
-    for map_info in maps_data
-    if map_info.get("name") and map_info.get("difficulty") is not None
-}
+# live view: always reflects the latest map list after /update_map
+MAP_TIERS = map_catalog.tiers
@@ -52,4 +52,16 @@ def diff_seconds_to_time(diff_sec):
         formatted_time += f"{minutes}:{seconds:02d}.{milliseconds:03d}"
     else:
         formatted_time += f"{seconds:02d}.{milliseconds:03d}"
-    return formatted_time
\ No newline at end of file
+    return formatted_time
+
+
+def format_age(seconds):
+    """数据距今多久, 例如 `5分钟前`"""
+    seconds = max(0, int(seconds))
+    if seconds < 60:
+        return "刚刚"
+    if seconds < 3600:
+        return f"{seconds // 60}分钟前"
+    if seconds < 86400:
+        return f"{seconds // 3600}小时前"
+    return f"{seconds // 86400}天前"
@@ -0,0 +1,44 @@
+import base64
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# Resolves once the page has gone `quietMs` without DOM mutations or new network
+# resources, or after `maxMs` at the latest. Runs inside the page via execute_async_script.
+_SETTLE_SCRIPT = """
+const [quietMs, maxMs, done] = arguments;
+const start = performance.now();
+let last = performance.now();
+let resources = performance.getEntriesByType('resource').length;
+const observer = new MutationObserver(() => { last = performance.now(); });
+observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+(function check() {
+    const now = performance.now();
+    const count = performance.getEntriesByType('resource').length;
+    if (count !== resources) { resources = count; last = now; }
+    if ((document.readyState === 'complete' && now - last >= quietMs) || now - start >= maxMs) {
+        observer.disconnect();
+        done(now - start);
+    } else {
+        setTimeout(check, 50);
+    }
+})();
+"""
+
+
+def wait_until_settled(driver: WebDriver, quiet_ms=300, max_ms=5000) -> float:
+    """block until the DOM and network have been idle for `quiet_ms`, returns the time waited in ms"""
+    driver.set_script_timeout(max_ms / 1000 + 5)
+    try:
+        return driver.execute_async_script(_SETTLE_SCRIPT, quiet_ms, max_ms)
+    except TimeoutException:
+        return max_ms
+
+
+def capture_clip(driver: WebDriver, left, top, right, bottom) -> bytes:
+    """PNG of a page region straight from Chrome, without a full-window screenshot + crop"""
+    result = driver.execute_cdp_cmd("Page.captureScreenshot", {
+        "format": "png",
+        "clip": {"x": left, "y": top, "width": right - left, "height": bottom - top, "scale": 1},
+    })
+    return base64.b64decode(result["data"])
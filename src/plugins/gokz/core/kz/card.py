@@ -0,0 +1,228 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import lru_cache
+from io import BytesIO
+
+import aiohttp
+from PIL import Image, ImageDraw, ImageFont
+from nonebot import logger
+
+from src.plugins.gokz.api.helper import get_http_session
+from src.plugins.gokz.config import CARD_FONT_PATH
+from src.plugins.gokz.core.config import MAP_TIERS
+from src.plugins.gokz.core.kreedz import format_kzmode
+from src.plugins.gokz.core.kz.image_cache import screenshot_cache
+from src.plugins.gokz.core.metrics import render_seconds
+from src.plugins.gokz.core.record_store import record_store
+from src.plugins.gokz.core.steam_user import convert_steamid, get_steam_user_info
+
+WIDTH = 640
+HEADER_HEIGHT = 150
+STATS_HEIGHT = 90
+TIER_ROW_HEIGHT = 46
+TIERS = range(1, 8)
+HEIGHT = HEADER_HEIGHT + STATS_HEIGHT + TIER_ROW_HEIGHT * len(TIERS) + 20
+AVATAR_SIZE = 96
+AVATAR_TIMEOUT = 5  # seconds, a card without the avatar beats a stalled /kz
+CARD_MAX_AGE = timedelta(hours=1).total_seconds()
+
+BACKGROUND = (27, 29, 36)
+PANEL = (38, 41, 51)
+TEXT = (235, 235, 240)
+SUBTEXT = (150, 155, 170)
+BAR_BG = (58, 62, 75)
+TP_COLOR = (255, 183, 77)
+PRO_COLOR = (100, 181, 246)
+TIER_COLORS = {
+    1: (129, 199, 132), 2: (174, 213, 129), 3: (255, 241, 118), 4: (255, 183, 77),
+    5: (255, 138, 101), 6: (239, 83, 80), 7: (171, 71, 188),
+}
+
+
+@dataclass
+class TierProgress:
+    total: int = 0
+    tp: int = 0
+    pro: int = 0
+
+
+@dataclass
+class CardStats:
+    name: str
+    steamid: str
+    mode: str
+    tp_points: int = 0
+    pro_points: int = 0
+    tp_count: int = 0
+    pro_count: int = 0
+    tp_1000: int = 0
+    pro_1000: int = 0
+    tiers: dict[int, TierProgress] = field(default_factory=dict)
+
+    @property
+    def total_points(self) -> int:
+        return self.tp_points + self.pro_points
+
+
+def summarize_records(records: list, tiers: dict = MAP_TIERS, name=None, steamid=None, mode='kz_timer') -> CardStats:
+    """fold a player's top records (TP + PRO) into the numbers shown on the card"""
+    stats = CardStats(
+        name=name or (records[0]['player_name'] if records else 'Unknown'),
+        steamid=steamid or (records[0]['steam_id'] if records else ''),
+        mode=format_kzmode(mode, 'm'),
+        tiers={tier: TierProgress() for tier in TIERS},
+    )
+    for tier in tiers.values():
+        if tier in stats.tiers:
+            stats.tiers[tier].total += 1
+
+    for record in records:
+        points = record.get('points') or 0
+        progress = stats.tiers.get(tiers.get(record['map_name']))
+        if record['teleports'] > 0:
+            stats.tp_count += 1
+            stats.tp_points += points
+            stats.tp_1000 += points == 1000
+            if progress:
+                progress.tp += 1
+        else:
+            stats.pro_count += 1
+            stats.pro_points += points
+            stats.pro_1000 += points == 1000
+            if progress:
+                progress.pro += 1
+    return stats
+
+
+class CardFontMissing(RuntimeError):
+    """CARD_FONT_PATH doesn't point at a usable font"""
+
+
+@lru_cache(maxsize=16)
+def _font(size: int) -> ImageFont.FreeTypeFont:
+    try:
+        return ImageFont.truetype(CARD_FONT_PATH, size)
+    except OSError as e:
+        # Pillow's built-in font has no CJK glyphs, labels and names would come out as boxes
+        raise CardFontMissing(
+            f"Card font {CARD_FONT_PATH!r} can't be loaded ({e}), "
+            f"set CARD_FONT_PATH to a font with CJK glyphs such as Noto Sans CJK"
+        ) from e
+
+
+@lru_cache(maxsize=1)
+def _background() -> Image.Image:
+    """everything on the card that doesn't depend on the player"""
+    img = Image.new("RGB", (WIDTH, HEIGHT), BACKGROUND)
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle((16, 16, WIDTH - 16, HEADER_HEIGHT - 8), radius=12, fill=PANEL)
+    draw.rounded_rectangle((16, HEADER_HEIGHT, WIDTH - 16, HEADER_HEIGHT + STATS_HEIGHT - 8), radius=12, fill=PANEL)
+
+    top = HEADER_HEIGHT + STATS_HEIGHT
+    for i, tier in enumerate(TIERS):
+        y = top + i * TIER_ROW_HEIGHT
+        draw.text((24, y + 10), f"T{tier}", font=_font(20), fill=TIER_COLORS[tier])
+        for j in range(2):
+            bar_y = y + 6 + j * 18
+            draw.rounded_rectangle((80, bar_y, WIDTH - 140, bar_y + 12), radius=6, fill=BAR_BG)
+
+    legend_y = HEIGHT - 18
+    draw.text((80, legend_y), "TP", font=_font(12), fill=TP_COLOR)
+    draw.text((110, legend_y), "PRO", font=_font(12), fill=PRO_COLOR)
+    return img
+
+
+def _paste_avatar(img: Image.Image, avatar: bytes | None):
+    if not avatar:
+        return
+    try:
+        avatar_img = Image.open(BytesIO(avatar)).convert("RGB").resize((AVATAR_SIZE, AVATAR_SIZE))
+    except OSError:
+        return
+    mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+    ImageDraw.Draw(mask).rounded_rectangle((0, 0, AVATAR_SIZE, AVATAR_SIZE), radius=12, fill=255)
+    img.paste(avatar_img, (32, 32), mask)
+
+
+def render_card(stats: CardStats, avatar: bytes | None = None) -> Image.Image:
+    img = _background().copy()
+    draw = ImageDraw.Draw(img)
+    _paste_avatar(img, avatar)
+
+    draw.text((146, 36), stats.name, font=_font(30), fill=TEXT)
+    draw.text((146, 78), stats.steamid, font=_font(18), fill=SUBTEXT)
+    draw.text((146, 104), stats.mode.upper(), font=_font(18), fill=TP_COLOR)
+
+    columns = [
+        ("总分", f"{stats.total_points:,}"),
+        ("TP", f"{stats.tp_points:,} / {stats.tp_count}"),
+        ("PRO", f"{stats.pro_points:,} / {stats.pro_count}"),
+        ("1000分", f"{stats.tp_1000 + stats.pro_1000}"),
+    ]
+    column_width = (WIDTH - 48) // len(columns)
+    for i, (label, value) in enumerate(columns):
+        x = 32 + i * column_width
+        draw.text((x, HEADER_HEIGHT + 12), label, font=_font(16), fill=SUBTEXT)
+        draw.text((x, HEADER_HEIGHT + 38), value, font=_font(20), fill=TEXT)
+
+    top = HEADER_HEIGHT + STATS_HEIGHT
+    bar_width = WIDTH - 140 - 80
+    for i, tier in enumerate(TIERS):
+        progress = stats.tiers.get(tier) or TierProgress()
+        y = top + i * TIER_ROW_HEIGHT
+        for j, (done, color) in enumerate(((progress.tp, TP_COLOR), (progress.pro, PRO_COLOR))):
+            bar_y = y + 6 + j * 18
+            if progress.total and done:
+                filled = max(12, int(bar_width * min(done / progress.total, 1)))
+                draw.rounded_rectangle((80, bar_y, 80 + filled, bar_y + 12), radius=6, fill=color)
+            draw.text((WIDTH - 130, bar_y - 2), f"{done}/{progress.total}", font=_font(14), fill=SUBTEXT)
+    return img
+
+
+async def _fetch_avatar(steamid) -> bytes | None:
+    try:
+        info = await get_steam_user_info(steamid)
+        if not info or 'avatarfull' not in info:
+            return None
+        session = await get_http_session()
+        async with session.get(info['avatarfull'], timeout=aiohttp.ClientTimeout(total=AVATAR_TIMEOUT)) as response:
+            return await response.read()
+    except Exception as e:
+        logger.warning(f"Failed to fetch avatar for {steamid}: {e!r}")
+        return None
+
+
+def _timed_render_card(stats, avatar):
+    with render_seconds.time(kind='card'):
+        return render_card(stats, avatar)
+
+
+def _card_key(steamid, kz_mode) -> str:
+    return f"{convert_steamid(steamid, 64)}_{format_kzmode(kz_mode, 'm')}_card"
+
+
+def cached_card(steamid, kz_mode) -> str | None:
+    """the card /kz card would reuse instead of drawing, if there is one"""
+    cached = screenshot_cache.get(_card_key(steamid, kz_mode), max_age=CARD_MAX_AGE)
+    return str(cached) if cached else None
+
+
+async def native_card_async(steamid, kz_mode, force_update=False) -> str:
+    """draw the player card from the stored records, no browser needed; raises CardFontMissing without a font"""
+    if not force_update and (cached := cached_card(steamid, kz_mode)):
+        return cached
+    _font(30)  # fail before fetching anything
+    steamid64 = convert_steamid(steamid, 64)
+    mode = format_kzmode(kz_mode)
+
+    records, avatar = await asyncio.gather(
+        record_store.top_records(steamid64, mode, force_update),
+        _fetch_avatar(steamid64),
+    )
+    stats = summarize_records(records, steamid=convert_steamid(steamid64), mode=mode)
+
+    loop = asyncio.get_event_loop()
+    img = await loop.run_in_executor(None, _timed_render_card, stats, avatar)
+    cache_file = await loop.run_in_executor(None, screenshot_cache.put, _card_key(steamid64, mode), img)
+    return str(cache_file)
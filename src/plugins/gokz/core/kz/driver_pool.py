@@ -0,0 +1,117 @@
+import queue
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from nonebot import logger
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+
+def chrome_options() -> webdriver.ChromeOptions:
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")  # Run Chrome in headless mode
+    options.add_argument("--no-sandbox")  # Bypass OS security model
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-extensions")
+    return options
+
+
+@dataclass
+class PooledDriver:
+    driver: webdriver.Chrome
+    renders: int = 0
+
+
+class DriverPool:
+    """
+    A bounded pool of long-lived headless Chrome drivers, used from the screenshot executor threads.
+    Drivers are started lazily, health-checked before reuse, and recycled after
+    `max_renders` renders or as soon as a render raises.
+    """
+
+    def __init__(self, size: int, max_renders: int = 50):
+        self.size = size
+        self.max_renders = max_renders
+        self._idle: queue.LifoQueue[PooledDriver] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.launched = 0
+        self.recycled = 0
+
+    @contextmanager
+    def driver(self):
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+
+        with self._slots:
+            pooled = self._take()
+            try:
+                yield pooled.driver
+            except Exception:
+                self._discard(pooled)
+                raise
+            pooled.renders += 1
+            self._give_back(pooled)
+
+    def _take(self) -> PooledDriver:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._launch()
+            if self._healthy(pooled):
+                return pooled
+            self._discard(pooled)
+
+    def _launch(self) -> PooledDriver:
+        driver = webdriver.Chrome(options=chrome_options())
+        with self._lock:
+            self.launched += 1
+        return PooledDriver(driver)
+
+    @staticmethod
+    def _healthy(pooled: PooledDriver) -> bool:
+        try:
+            _ = pooled.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def _give_back(self, pooled: PooledDriver):
+        if self._closed or pooled.renders >= self.max_renders:
+            self._discard(pooled)
+            return
+        try:
+            # park on a blank page so idle drivers don't keep running page scripts
+            pooled.driver.get("about:blank")
+        except WebDriverException:
+            self._discard(pooled)
+            return
+        self._idle.put(pooled)
+
+    def _discard(self, pooled: PooledDriver):
+        with self._lock:
+            self.recycled += 1
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit chrome driver: {e!r}")
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'idle': self._idle.qsize(),
+            'launched': self.launched,
+            'recycled': self.recycled,
+        }
@@ -0,0 +1,172 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+
+import nonebot_plugin_localstore as store
+from PIL import Image
+from nonebot import logger, require
+
+from src.plugins.gokz.config import SCREENSHOT_CACHE_MAX_MB, SCREENSHOT_FORMAT, SCREENSHOT_QUALITY
+
+require("nonebot_plugin_localstore")
+
+FORMATS = {
+    # name: (file extension, Pillow save kwargs); "png" keeps the captured bytes untouched
+    "png": (".png", None),
+    "png-optimized": (".png", {"format": "PNG", "optimize": True}),
+    "webp": (".webp", {"format": "WEBP", "method": 4}),
+    "jpeg": (".jpg", {"format": "JPEG", "optimize": True, "progressive": True}),
+}
+
+
+@dataclass
+class ImageEntry:
+    path: Path
+    size: int
+    created: float
+    last_access: float
+
+
+class ImageCache:
+    """
+    Rendered images on disk, tracked by an in-memory index so lookups never touch the filesystem.
+    The directory is scanned once on first use; after that the least recently used
+    images are evicted whenever the total size goes over `max_bytes`.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, image_format="png", quality=85):
+        if image_format not in FORMATS:
+            raise ValueError(f"Invalid image format: {image_format}")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.image_format = image_format
+        self.quality = quality
+        self.total_bytes = 0
+        self.evictions = 0
+        self._index: OrderedDict[str, ImageEntry] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.image_format][0]
+
+    def _ensure_index(self) -> OrderedDict[str, ImageEntry]:
+        if self._index is not None:
+            return self._index
+
+        extensions = {ext for ext, _ in FORMATS.values()}
+        entries = []
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.iterdir():
+            if path.suffix not in extensions or not path.is_file():
+                continue
+            stat = path.stat()
+            entries.append((path.stem, ImageEntry(path, stat.st_size, stat.st_mtime, stat.st_atime)))
+
+        entries.sort(key=lambda item: item[1].last_access)
+        self._index = OrderedDict(entries)
+        self.total_bytes = sum(entry.size for _, entry in entries)
+        self._evict()
+        return self._index
+
+    def get(self, key: str, max_age: float | None = None) -> Path | None:
+        """path of a cached image no older than `max_age` seconds, or None"""
+        with self._lock:
+            index = self._ensure_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if max_age is not None and time.time() - entry.created > max_age:
+                return None
+            entry.last_access = time.time()
+            index.move_to_end(key)
+            return entry.path
+
+    def put(self, key: str, image: bytes | Image.Image) -> Path:
+        data = self._encode(image)
+        path = self.directory / f"{key}{self.extension}"
+
+        # write to a temp file first so readers never see a half-written image
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        now = time.time()
+        with self._lock:
+            index = self._ensure_index()
+            old = index.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.size
+                if old.path != path:
+                    old.path.unlink(missing_ok=True)
+            index[key] = ImageEntry(path, len(data), now, now)
+            self.total_bytes += len(data)
+            self._evict()
+        return path
+
+    def _encode(self, image: bytes | Image.Image) -> bytes:
+        save_kwargs = FORMATS[self.image_format][1]
+        if save_kwargs is None:
+            if isinstance(image, bytes):
+                return image
+            save_kwargs = {"format": "PNG"}
+        elif save_kwargs["format"] in ("WEBP", "JPEG"):
+            save_kwargs = {**save_kwargs, "quality": self.quality}
+
+        if isinstance(image, bytes):
+            image = Image.open(BytesIO(image))
+        if save_kwargs["format"] == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        buffer = BytesIO()
+        image.save(buffer, **save_kwargs)
+        return buffer.getvalue()
+
+    def _evict(self):
+        # caller holds the lock; never evict the newest entry
+        while self.total_bytes > self.max_bytes and len(self._index) > 1:
+            _, entry = self._index.popitem(last=False)
+            self.total_bytes -= entry.size
+            self.evictions += 1
+            try:
+                entry.path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Failed to evict {entry.path}: {e!r}")
+
+    def random_path(self) -> Path | None:
+        with self._lock:
+            index = self._ensure_index()
+            if not index:
+                return None
+            return random.choice(list(index.values())).path
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._ensure_index()
+            return {
+                'entries': len(index),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'format': self.image_format,
+            }
+
+
+screenshot_cache = ImageCache(
+    store.get_cache_dir("plugin_name"),
+    max_bytes=SCREENSHOT_CACHE_MAX_MB * 1024 * 1024,
+    image_format=SCREENSHOT_FORMAT,
+    quality=SCREENSHOT_QUALITY,
+)
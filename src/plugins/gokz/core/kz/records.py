@@ -20,3 +20,55 @@ def count_servers(records: List[Dict], limit=5) -> List[Dict]:
         })
 
     return result
+
+
+def best_points_by_map(records: List[Dict]) -> Dict[str, int]:
+    """每张图的最高分, TP 和 PRO 记录取高的那个"""
+    best = {}
+    for record in records:
+        map_name = record['map_name']
+        points = record.get('points') or 0
+        if points >= best.get(map_name, -1):
+            best[map_name] = points
+    return best
+
+
+def compare_maps(records1: List[Dict], records2: List[Dict]) -> Dict:
+    """两名玩家完成过的地图对比, 以及共同地图上谁的分数更高"""
+    best1 = best_points_by_map(records1)
+    best2 = best_points_by_map(records2)
+    maps1, maps2 = best1.keys(), best2.keys()
+
+    shared = maps1 & maps2
+    wins1 = sum(1 for map_name in shared if best1[map_name] > best2[map_name])
+    wins2 = sum(1 for map_name in shared if best1[map_name] < best2[map_name])
+    return {
+        "shared": len(shared),
+        "only1": len(maps1 - maps2),
+        "only2": len(maps2 - maps1),
+        "wins1": wins1,
+        "wins2": wins2,
+        "draws": len(shared) - wins1 - wins2,
+    }
+
+
+def progress_history(records: List[Dict]) -> tuple[List[Dict], List[int]]:
+    """
+    一张图上每次刷新个人最好成绩的记录 (最新的在前),
+    以及每条记录之前完成了几次但没有破纪录
+    """
+    records = sorted(records, key=lambda x: x['created_on'])
+    history = []
+    completions = []
+    completions_counter = 0
+    for record in records:
+        if not history or record['time'] < history[-1]['time']:
+            history.append(record)
+            completions.append(completions_counter)
+            completions_counter = 0
+        else:
+            completions_counter += 1
+
+    history.reverse()
+    completions.reverse()
+    return history, completions
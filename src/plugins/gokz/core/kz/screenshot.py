@@ -1,152 +1,161 @@
 import asyncio
-import random
-import time
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, timedelta
-from io import BytesIO
+from datetime import timedelta
 from pathlib import Path
 
-import nonebot_plugin_localstore as store
-from PIL import Image
-from nonebot import require
-from selenium import webdriver
+from nonebot import get_driver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
-from src.plugins.gokz.core.file_oper import check_last_modified_date
+from src.plugins.gokz.config import MAX_RENDER_WORKERS
 from src.plugins.gokz.core.kreedz import format_kzmode
+from src.plugins.gokz.core.kz.capture import wait_until_settled, capture_clip
+from src.plugins.gokz.core.kz.driver_pool import DriverPool
+from src.plugins.gokz.core.kz.image_cache import screenshot_cache
+from src.plugins.gokz.core.metrics import render_seconds
+from src.plugins.gokz.core.singleflight import SingleFlight
 from src.plugins.gokz.core.steam_user import convert_steamid
 
-require("nonebot_plugin_localstore")
+# how long a rendered image is reused
+KZGOEU_MAX_AGE = timedelta(hours=1).total_seconds()
+VNL_MAX_AGE = timedelta(days=1).total_seconds()
 
-executor = ThreadPoolExecutor(max_workers=5)
+executor = ThreadPoolExecutor(max_workers=MAX_RENDER_WORKERS)
+# one warm chrome per executor thread
+driver_pool = DriverPool(size=MAX_RENDER_WORKERS)
+
+# concurrent /kz for the same (steamid64, mode) wait on one render
+inflight_renders = SingleFlight()
+
+
+def timed_render(kind, render, *args):
+    """runs on the executor thread, so only the render itself is timed, not the wait for a worker"""
+    with render_seconds.time(kind=kind):
+        return render(*args)
 
 
 async def kzgoeu_screenshot_async(steamid, kz_mode, force_update=False):
     loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        executor, kzgoeu_screenshot, steamid, kz_mode, force_update
-    )
+    key = (convert_steamid(steamid, 64), format_kzmode(kz_mode, 'm'))
+    result = await inflight_renders.do(key, lambda: loop.run_in_executor(
+        executor, timed_render, 'kzgoeu', kzgoeu_screenshot, steamid, kz_mode, force_update
+    ))
     return result
 
 
 async def vnl_screenshot_async(steamid, force_update=False):
     loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(executor, vnl_screenshot, steamid, force_update)
+    key = (convert_steamid(steamid, 64), 'vnl')
+    result = await inflight_renders.do(key, lambda: loop.run_in_executor(
+        executor, timed_render, 'vnl', vnl_screenshot, steamid, force_update
+    ))
     return result
 
 
-def random_card():
-    cache_dir: Path = store.get_cache_dir("plugin_name")
-    png_files = list(cache_dir.glob("*.png"))
-    if not png_files:
-        raise FileNotFoundError("No .png files found in the cache directory")
-    random_file = random.choice(png_files)
-    return random_file
+@get_driver().on_shutdown
+async def close_render_resources():
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, driver_pool.close)
+    executor.shutdown(wait=False, cancel_futures=True)
 
 
-def kzgoeu_screenshot(steamid, kz_mode, force_update=False):
-    steamid = convert_steamid(steamid)
+def cached_screenshot(steamid, kz_mode) -> str | None:
+    """the image /kz would reuse instead of rendering, if there is one"""
+    steamid64 = convert_steamid(steamid, 64)
     kz_mode = format_kzmode(kz_mode, 'm')
+    if kz_mode == 'vnl':
+        cached = screenshot_cache.get(f"{steamid64}_kz_vanilla", max_age=VNL_MAX_AGE)
+    else:
+        cached = screenshot_cache.get(f"{steamid64}_{kz_mode}", max_age=KZGOEU_MAX_AGE)
+    return str(cached) if cached else None
 
-    steamid64 = convert_steamid(steamid, 64)
 
-    cache_file = store.get_cache_file("plugin_name", f"{steamid64}_{kz_mode}.png")
+def random_card() -> Path:
+    random_file = screenshot_cache.random_path()
+    if random_file is None:
+        raise FileNotFoundError("No cached images found in the cache directory")
+    return random_file
 
-    # Check last modified date of the file
-    if not force_update:
-        last_modified_date = check_last_modified_date(cache_file)
-        if last_modified_date and (datetime.now() - last_modified_date <= timedelta(hours=1)):
-            return str(cache_file)
 
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless")  # Run Chrome in headless mode
-    options.add_argument("--no-sandbox")  # Bypass OS security model
+def kzgoeu_screenshot(steamid, kz_mode, force_update=False):
+    steamid64 = convert_steamid(steamid, 64)
+    steamid = convert_steamid(steamid)
+    kz_mode = format_kzmode(kz_mode, 'm')
 
-    driver = webdriver.Chrome(options=options)
+    cache_key = f"{steamid64}_{kz_mode}"
 
-    kzgo_url = f"https://kzgo.eu/players/{steamid}?{kz_mode}"
-    driver.get(kzgo_url)
+    # Reuse the cached image if it was rendered within the last hour
+    if not force_update:
+        cached = screenshot_cache.get(cache_key, max_age=KZGOEU_MAX_AGE)
+        if cached:
+            return str(cached)
 
     width = 700
     height = 1000
-    driver.set_window_size(width, height)
 
-    wait = WebDriverWait(driver, 30)
-    wait.until(EC.presence_of_element_located((By.CLASS_NAME, "progress-bg")))
-    time.sleep(1)
+    with driver_pool.driver() as driver:
+        driver.set_window_size(width, height)
 
-    screenshot = driver.get_screenshot_as_png()
-    driver.quit()
-    img = Image.open(BytesIO(screenshot))
+        kzgo_url = f"https://kzgo.eu/players/{steamid}?{kz_mode}"
+        driver.get(kzgo_url)
 
-    # Crop the image
-    left = 90
-    top = 100
-    right = width - 100
-    bottom = height - 280
-    cropped_img = img.crop((left, top, right, bottom))
+        wait = WebDriverWait(driver, 30)
+        wait.until(EC.presence_of_element_located((By.CLASS_NAME, "progress-bg")))
+        wait_until_settled(driver)
 
-    # Save the cropped screenshot to the cache directory
-    cropped_img.save(cache_file)
+        # Capture only the player card region
+        left = 90
+        top = 100
+        right = width - 100
+        bottom = height - 280
+        screenshot = capture_clip(driver, left, top, right, bottom)
+
+    # Save the screenshot to the cache directory
+    cache_file = screenshot_cache.put(cache_key, screenshot)
 
     return str(cache_file)
 
 
 def vnl_screenshot(steamid, force_update=False):
-    steamid64 = convert_steamid(steamid, 2)
-    steamid = convert_steamid(steamid)
     steamid64 = convert_steamid(steamid, 64)
 
-    cache_file = store.get_cache_file("plugin_name", f"{steamid64}_kz_vanilla.png")
+    cache_key = f"{steamid64}_kz_vanilla"
 
-    # Check last modified date of the file
+    # Reuse the cached image if it was rendered within the last day
     if not force_update:
-        last_modified_date = check_last_modified_date(cache_file)
-        if last_modified_date and (datetime.now() - last_modified_date <= timedelta(days=1)):
-            # If file modified within 1 day, return URL directly
-            return str(cache_file)
-
-    # Use Selenium to open the browser
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless")  # Run Chrome in headless mode
-    options.add_argument("--no-sandbox")  # Bypass OS security model
-
-    driver = webdriver.Chrome(options=options)
-
-    # Open the VNL page
-    kzgo_url = f"https://vnl.kz/#/stats/{steamid64}"
-    driver.get(kzgo_url)
+        cached = screenshot_cache.get(cache_key, max_age=VNL_MAX_AGE)
+        if cached:
+            return str(cached)
 
-    # Set browser window size
     width = 920
     height = 620
-    driver.set_window_size(width, height)
 
-    # Wait for the webpage to load
-    WebDriverWait(driver, 30).until(
-        EC.presence_of_element_located((By.XPATH, "//p[contains(text(), 'TP')]"))
-    )
+    # Borrow a warm browser from the pool
+    with driver_pool.driver() as driver:
+        # Set browser window size
+        driver.set_window_size(width, height)
 
-    # Capture a screenshot of the entire webpage
-    screenshot = driver.get_screenshot_as_png()
+        # Open the VNL page
+        kzgo_url = f"https://vnl.kz/#/stats/{steamid64}"
+        driver.get(kzgo_url)
 
-    # Close the browser
-    driver.quit()
+        # Wait for the webpage to load
+        WebDriverWait(driver, 30).until(
+            EC.presence_of_element_located((By.XPATH, "//p[contains(text(), 'TP')]"))
+        )
 
-    # Open the screenshot with Pillow
-    img = Image.open(BytesIO(screenshot))
+        wait_until_settled(driver)
 
-    # Crop the image
-    left = 0
-    top = 65
-    right = width - 15
-    bottom = height - 95
-    cropped_img = img.crop((left, top, right, bottom))
+        # Capture only the stats panel
+        left = 0
+        top = 65
+        right = width - 15
+        bottom = height - 95
+        screenshot = capture_clip(driver, left, top, right, bottom)
 
-    # Save the cropped screenshot to the cache directory
-    cropped_img.save(cache_file)
+    # Save the screenshot to the cache directory
+    cache_file = screenshot_cache.put(cache_key, screenshot)
 
     return str(cache_file)
 
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from nonebot import logger
+from sqlmodel import select
+
+from src.plugins.gokz.api.helper import fetch_json
+from src.plugins.gokz.config import LEADERBOARD_SYNC_CONCURRENCY, LEADERBOARD_SYNC_RATE
+from src.plugins.gokz.db.crud import upsert_leaderboards
+from src.plugins.gokz.db.db import async_session
+from src.plugins.gokz.db.models import User
+
+CURSOR_FILE = Path("data/gokz/leaderboard_sync.json")
+LEADERBOARD_URL = "https://api.gokz.top/leaderboard/{steamid}?mode=kz_timer"
+
+
+class RateLimiter:
+    """spaces calls at least 1/rate seconds apart, shared by all workers"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+@dataclass
+class SyncReport:
+    users: int = 0
+    rows: int = 0
+    missing: int = 0
+    failed: int = 0
+    resumed_from: str | None = None
+    started: float = field(default_factory=time.monotonic)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.elapsed or time.monotonic() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+
+class LeaderboardSync:
+    """
+    Mirrors api.gokz.top leaderboard data for every bound user into the `leaderboard` table.
+    Users are walked in qid order one page at a time (keyset pagination), each page is fetched
+    with bounded concurrency under a global rate limit and written with a single batched upsert.
+    The last finished qid is kept in `cursor_file`, so an interrupted run picks up where it stopped.
+    """
+
+    def __init__(self, page_size=200, concurrency=LEADERBOARD_SYNC_CONCURRENCY, rate=LEADERBOARD_SYNC_RATE,
+                 cursor_file: Path = CURSOR_FILE):
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.rate = rate
+        self.cursor_file = Path(cursor_file)
+        self._lock = asyncio.Lock()
+        self.last_report: SyncReport | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _load_cursor(self) -> str | None:
+        try:
+            return json.loads(self.cursor_file.read_text(encoding="utf-8")).get("qid")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_cursor(self, qid: str):
+        self.cursor_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cursor_file.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"qid": qid}), encoding="utf-8")
+        os.replace(tmp_path, self.cursor_file)
+
+    async def _page(self, after: str | None) -> list[tuple[str, str]]:
+        statement = select(User.qid, User.steamid).order_by(User.qid).limit(self.page_size)  # NOQA
+        if after is not None:
+            statement = statement.where(User.qid > after)  # NOQA
+        async with async_session() as session:
+            return list(await session.exec(statement))
+
+    async def _fetch(self, steamid: str, semaphore: asyncio.Semaphore, limiter: RateLimiter, report: SyncReport):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                # not through response_cache, a bulk run would evict what interactive commands use
+                data = await fetch_json(LEADERBOARD_URL.format(steamid=steamid), timeout=15)
+            except Exception as e:
+                report.failed += 1
+                logger.warning(f"Leaderboard sync of {steamid} failed: {e!r}")
+                return None
+
+        if not isinstance(data, dict) or data.get('detail') or not data.get('steamid'):
+            report.missing += 1
+            return None
+        return data
+
+    async def run(self) -> SyncReport | None:
+        """sync every bound user, returns None if a sync is already running"""
+        if self.running:
+            return None
+
+        async with self._lock:
+            cursor = self._load_cursor()
+            report = SyncReport(resumed_from=cursor)
+            self.last_report = report
+            semaphore = asyncio.Semaphore(self.concurrency)
+            limiter = RateLimiter(self.rate)
+            logger.info(f"Leaderboard sync started{f' (resuming after qid {cursor})' if cursor else ''}")
+
+            while users := await self._page(cursor):
+                steamids = {steamid for _, steamid in users if steamid}
+                results = await asyncio.gather(*(self._fetch(steamid, semaphore, limiter, report) for steamid in steamids))
+                rows = [data for data in results if data]
+                if rows:
+                    async with async_session() as session:
+                        await upsert_leaderboards(session, rows)
+
+                cursor = users[-1][0]
+                self._save_cursor(cursor)
+                report.users += len(users)
+                report.rows += len(rows)
+                logger.info(
+                    f"Leaderboard sync: {report.users} users, {report.rows} rows "
+                    f"({report.rows_per_second:.1f} rows/s), {report.missing} missing, {report.failed} failed"
+                )
+
+            self.cursor_file.unlink(missing_ok=True)
+            report.elapsed = time.monotonic() - report.started
+            logger.info(
+                f"Leaderboard sync finished in {report.elapsed:.0f}s: {report.rows} rows "
+                f"({report.rows_per_second:.1f} rows/s), {report.missing} missing, {report.failed} failed"
+            )
+            return report
+
+
+leaderboard_sync = LeaderboardSync()
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.plugins.gokz.core.map_search import MapSearchIndex
+
+MAPS_FILE = Path("data/gokz_maps.json")
+
+
+@dataclass(frozen=True, slots=True)
+class MapInfo:
+    id: int
+    name: str
+    tier: int
+    validated: bool
+    filesize: int
+    updated_on: str
+
+
+class MapCatalog:
+    """
+    The global map list, refreshable at runtime.
+    Each refresh builds a complete new dict and swaps it in with a single assignment,
+    so readers always see either the old or the new catalog, never a mix.
+    The search index is patched with only the maps that were added or removed.
+    """
+
+    def __init__(self, path: Path = MAPS_FILE):
+        self.path = Path(path)
+        self._maps: dict[str, MapInfo] = {}
+        self._tiers: dict[str, int] = {}
+        self._write_lock = threading.Lock()
+        self.search_index = MapSearchIndex()
+        self.tiers = TierView(self)
+
+    def __len__(self):
+        return len(self._maps)
+
+    def __contains__(self, name):
+        return name in self._maps
+
+    def get(self, name: str) -> MapInfo | None:
+        return self._maps.get(name)
+
+    @staticmethod
+    def parse(maps_data: list) -> dict[str, MapInfo]:
+        """raises ValueError for anything but a non-empty list of maps, e.g. an error response"""
+        if not isinstance(maps_data, list) or not all(isinstance(map_info, dict) for map_info in maps_data):
+            raise ValueError(f"Map list expected, got {str(maps_data)[:200]}")
+        maps = {
+            map_info["name"]: MapInfo(
+                id=map_info.get("id"),
+                name=map_info["name"],
+                tier=map_info["difficulty"],
+                validated=map_info.get("validated", False),
+                filesize=map_info.get("filesize", 0),
+                updated_on=map_info.get("updated_on", ""),
+            )
+            for map_info in maps_data
+            if map_info.get("name") and map_info.get("difficulty") is not None
+        }
+        if not maps:
+            raise ValueError("Map list is empty")
+        return maps
+
+    def load(self) -> tuple[set, set]:
+        with self.path.open("r", encoding="utf-8") as f:
+            return self.replace(json.load(f))
+
+    def save(self, maps_data: list):
+        """write the raw map list to the catalog file via a temp file, so a crash never leaves it truncated"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(maps_data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def replace(self, maps_data: list) -> tuple[set, set]:
+        """swap in a new map list, returns the (added, removed) map names"""
+        maps = self.parse(maps_data)
+        tiers = {name: info.tier for name, info in maps.items()}
+
+        with self._write_lock:
+            added = maps.keys() - self._maps.keys()
+            removed = self._maps.keys() - maps.keys()
+            self._maps, self._tiers = maps, tiers
+
+            for name in removed:
+                self.search_index.remove(name)
+            for name in added:
+                self.search_index.add(name)
+        return added, removed
+
+
+class TierView(Mapping):
+    """read-only `map name -> tier` view that always reflects the catalog's current map list"""
+
+    def __init__(self, catalog: MapCatalog):
+        self._catalog = catalog
+
+    def __getitem__(self, name):
+        return self._catalog._tiers[name]
+
+    def __iter__(self):
+        return iter(self._catalog._tiers)
+
+    def __len__(self):
+        return len(self._catalog._tiers)
+
+    def __contains__(self, name):
+        return name in self._catalog._tiers
+
+
+map_catalog = MapCatalog()
+map_catalog.load()
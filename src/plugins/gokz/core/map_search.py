@@ -0,0 +1,146 @@
+import bisect
+import difflib
+from collections import OrderedDict, Counter
+
+MAP_PREFIXES = ('kz_', 'bkz_', 'xc_', 'skz_', 'vnl_', 'kzpro_')
+
+# how many trigram-ranked candidates get the (expensive) difflib ratio in the fuzzy fallback
+FUZZY_SHORTLIST = 40
+
+
+def normalize_map_name(name: str) -> str:
+    """kz_Ladder-All -> ladderall"""
+    name = name.lower().strip()
+    for prefix in MAP_PREFIXES:
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+            break
+    return name.replace('_', '').replace('-', '').replace(' ', '')
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class MapSearchIndex:
+    """
+    Precomputed lookup structures over the map catalog:
+    trigram postings of the raw names (substring search), a sorted list of
+    normalized names (prefix search) and trigram postings of the normalized
+    names (fuzzy ranking). Recent queries are memoized until the catalog changes.
+    """
+
+    def __init__(self, names=(), memo_size=256):
+        self._names: set[str] = set()
+        self._raw_postings: dict[str, set[str]] = {}
+        self._norm_postings: dict[str, set[str]] = {}
+        self._prefix: list[tuple[str, str]] = []
+        self._memo: OrderedDict[tuple, tuple] = OrderedDict()
+        self.memo_size = memo_size
+        for name in names:
+            self._add(name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def add(self, name: str):
+        if name not in self._names:
+            self._add(name)
+            self._memo.clear()
+
+    def remove(self, name: str):
+        if name not in self._names:
+            return
+        self._names.discard(name)
+        for gram in trigrams(name):
+            self._discard_posting(self._raw_postings, gram, name)
+        normalized = normalize_map_name(name)
+        for gram in trigrams(normalized):
+            self._discard_posting(self._norm_postings, gram, name)
+        i = bisect.bisect_left(self._prefix, (normalized, name))
+        if i < len(self._prefix) and self._prefix[i] == (normalized, name):
+            del self._prefix[i]
+        self._memo.clear()
+
+    def _add(self, name: str):
+        self._names.add(name)
+        for gram in trigrams(name):
+            self._raw_postings.setdefault(gram, set()).add(name)
+        normalized = normalize_map_name(name)
+        for gram in trigrams(normalized):
+            self._norm_postings.setdefault(gram, set()).add(name)
+        bisect.insort(self._prefix, (normalized, name))
+
+    @staticmethod
+    def _discard_posting(postings: dict, gram: str, name: str):
+        names = postings.get(gram)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del postings[gram]
+
+    def search(self, map_name: str, threshold=0.2) -> list:
+        key = (map_name, threshold)
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            return list(self._memo[key])
+
+        result = tuple(self._search(map_name, threshold))
+        self._memo[key] = result
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return list(result)
+
+    def _search(self, map_name: str, threshold: float) -> list:
+        # 1. exact or substring matches, same order as the plain scan: exact hit first, then by name
+        matches = self._substring_matches(map_name)
+        if matches:
+            matches.sort(key=lambda x: (x != map_name, x))
+            return matches
+
+        # 2. prefix match on the normalized name, e.g. "Ladder All" -> kz_ladderall
+        normalized = normalize_map_name(map_name)
+        if normalized:
+            matches = self._prefix_matches(normalized)
+            if matches:
+                matches.sort(key=lambda x: (len(x), x))
+                return matches
+
+        # 3. fuzzy: shortlist by shared trigrams, then rank the shortlist with difflib
+        return self._fuzzy_matches(map_name, normalized, threshold)
+
+    def _substring_matches(self, map_name: str) -> list:
+        grams = trigrams(map_name)
+        if not grams:
+            return [name for name in self._names if map_name in name]
+
+        postings = sorted((self._raw_postings.get(gram, ()) for gram in grams), key=len)
+        if not postings[0]:
+            return []
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+        return [name for name in candidates if map_name in name]
+
+    def _prefix_matches(self, normalized: str) -> list:
+        i = bisect.bisect_left(self._prefix, (normalized, ''))
+        matches = []
+        while i < len(self._prefix) and self._prefix[i][0].startswith(normalized):
+            matches.append(self._prefix[i][1])
+            i += 1
+        return matches
+
+    def _fuzzy_matches(self, map_name: str, normalized: str, threshold: float) -> list:
+        shared = Counter()
+        for gram in trigrams(normalized):
+            shared.update(self._norm_postings.get(gram, ()))
+        if shared:
+            candidates = [name for name, _ in shared.most_common(FUZZY_SHORTLIST)]
+        else:
+            candidates = self._names
+        return difflib.get_close_matches(map_name, candidates, n=5, cutoff=threshold)
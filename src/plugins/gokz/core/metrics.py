@@ -0,0 +1,193 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds; from a cached lookup up to a slow selenium render
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels(names: tuple, values: dict) -> tuple:
+    return tuple(str(values.get(name, '')) for name in names)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()  # renders observe from executor threads
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """only ever goes up; with `collect`, read from a total that is counted elsewhere"""
+    kind = 'counter'
+
+    def __init__(self, name, help_, labels=(), collect=None):
+        super().__init__(name, help_, labels)
+        self._collect = collect
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> dict[tuple, float]:
+        if self._collect is None:
+            return dict(self._values)
+        return {_labels(self.label_names, labels): value for labels, value in self._collect()}
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in self.samples().items()
+        ]
+
+
+class Gauge(Metric):
+    """a value read when the metrics are collected"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_, labels=(), collect=None):
+        super().__init__(name, help_, labels)
+        self._collect = collect
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[_labels(self.label_names, labels)] = value
+
+    def samples(self) -> dict[tuple, float]:
+        if self._collect is None:
+            return dict(self._values)
+        return {_labels(self.label_names, labels): value for labels, value in self._collect()}
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in self.samples().items()
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (+Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _labels(self.label_names, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, **labels) -> float | None:
+        """estimated from the buckets, like prometheus' histogram_quantile"""
+        series = self._series.get(_labels(self.label_names, labels))
+        return self._quantile(series, q) if series else None
+
+    def _quantile(self, series, q: float) -> float | None:
+        counts, _, total = series
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def summary(self) -> dict[tuple, dict]:
+        """label values -> count, mean, p50, p95"""
+        with self._lock:
+            series = {key: [list(value[0]), value[1], value[2]] for key, value in self._series.items()}
+        return {
+            key: {
+                'count': value[2],
+                'mean': value[1] / value[2] if value[2] else 0.0,
+                'p50': self._quantile(value, 0.5),
+                'p95': self._quantile(value, 0.95),
+            }
+            for key, value in series.items()
+        }
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        with self._lock:
+            series = {key: [list(value[0]), value[1], value[2]] for key, value in self._series.items()}
+        for key, (counts, total_sum, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else f'{bound}'
+                bucket_labels = _format_labels(self.label_names, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total_sum}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name, help_, labels=(), collect=None) -> Counter:
+        return self.register(Counter(name, help_, labels, collect))
+
+    def gauge(self, name, help_, labels=(), collect=None) -> Gauge:
+        return self.register(Gauge(name, help_, labels, collect))
+
+    def histogram(self, name, help_, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_, labels, buckets))
+
+    def render(self) -> str:
+        """all metrics in the prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+command_seconds = registry.histogram(
+    'gokz_command_seconds', 'Time from matching a command to its handler finishing', ('command', 'outcome'))
+command_db_seconds = registry.histogram(
+    'gokz_command_db_seconds', 'Time CommandData spends resolving users (user cache + MySQL)')
+upstream_seconds = registry.histogram(
+    'gokz_upstream_seconds', 'Latency of single upstream GET attempts', ('host', 'outcome'))
+render_seconds = registry.histogram(
+    'gokz_render_seconds', 'Time spent producing a player image, cache hits included', ('kind',))
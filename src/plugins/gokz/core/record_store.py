@@ -0,0 +1,242 @@
+import asyncio
+import weakref
+from collections import Counter
+from datetime import datetime, timedelta
+
+import aiohttp
+from nonebot import logger
+from sqlmodel import select, delete, func
+
+from src.plugins.gokz.api.cache import TTL_RECORDS
+from src.plugins.gokz.api.helper import fetch_json
+from src.plugins.gokz.core.kreedz import format_kzmode
+from src.plugins.gokz.core.singleflight import SingleFlight
+from src.plugins.gokz.core.steam_user import convert_steamid
+from src.plugins.gokz.db.crud import upsert, increment
+from src.plugins.gokz.db.db import async_session
+from src.plugins.gokz.db.models import Record, RecordSyncState, ServerUsage
+
+RECORDS_URL = "https://api.gokz.top/records/{steamid}"
+SYNC_INTERVAL = timedelta(seconds=TTL_RECORDS)
+FULL_RESYNC_INTERVAL = timedelta(hours=24)
+BATCH_SIZE = 1000
+RECORD_COLUMNS = frozenset(Record.model_fields)
+
+
+def _parse_created_on(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    created_on = datetime.fromisoformat(value)
+    return created_on.replace(tzinfo=None)
+
+
+def record_row(data: dict, steam_id: str, mode: str) -> dict:
+    row = {key: data.get(key) for key in RECORD_COLUMNS}
+    row['steam_id'] = steam_id
+    # stored under the mode it was requested with, which is what the queries filter on
+    row['mode'] = mode
+    row['created_on'] = _parse_created_on(data['created_on'])
+    row['stage'] = row['stage'] or 0
+    row['teleports'] = row['teleports'] or 0
+    row['points'] = row['points'] or 0
+    return row
+
+
+def best_records(records: list[dict]) -> list[dict]:
+    """the fastest TP and PRO run of every map's main course, what `records/top` returns upstream"""
+    best = {}
+    for record in records:
+        if record.get('stage'):
+            continue  # bonus stages
+        key = (record['map_name'], record['teleports'] > 0)
+        if key not in best or record['time'] < best[key]['time']:
+            best[key] = record
+    return list(best.values())
+
+
+class RecordStore:
+    """
+    Local copy of every player's api.gokz.top records, one table row per record id.
+    The first request for a (player, mode) downloads the full history; after that only records
+    created since the stored watermark are requested and upserted. A full resync every
+    `full_resync_interval` drops records that were removed upstream (bans, deleted maps).
+    When upstream is down, whatever is stored locally is served.
+    """
+
+    def __init__(self, sync_interval=SYNC_INTERVAL, full_resync_interval=FULL_RESYNC_INTERVAL, batch_size=BATCH_SIZE):
+        self.sync_interval = sync_interval
+        self.full_resync_interval = full_resync_interval
+        self.batch_size = batch_size
+        self._inflight = SingleFlight()
+        # a full resync rebuilds the rows an incremental one adds deltas to, they must not interleave
+        self._locks: weakref.WeakValueDictionary[tuple, asyncio.Lock] = weakref.WeakValueDictionary()
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self.rows_written = 0
+
+    async def sync(self, steamid, mode, force_update=False) -> str:
+        """bring the local copy up to date, returns the steamid2 the records are stored under"""
+        steam_id = convert_steamid(steamid)
+        mode = format_kzmode(mode)
+        await self._inflight.do((steam_id, mode, force_update), lambda: self._sync(steam_id, mode, force_update))
+        return steam_id
+
+    async def _sync(self, steam_id: str, mode: str, force_update: bool):
+        lock = self._locks.get((steam_id, mode))
+        if lock is None:
+            lock = self._locks[steam_id, mode] = asyncio.Lock()
+        async with lock:
+            await self._sync_locked(steam_id, mode, force_update)
+
+    async def _sync_locked(self, steam_id: str, mode: str, force_update: bool):
+        async with async_session() as session:
+            state = await session.get(RecordSyncState, (steam_id, mode))
+        now = datetime.now()
+        if state and not force_update and now - state.synced_at < self.sync_interval:
+            return
+
+        full = force_update or not state or not state.watermark or now - state.full_synced_at > self.full_resync_interval
+        params = {'mode': mode}
+        if not full:
+            # the api returns the full history if it ignores this, the upsert keeps that correct
+            params['created_since'] = state.watermark.isoformat(timespec='seconds')
+
+        try:
+            data = await fetch_json(RECORDS_URL.format(steamid=steam_id), params=params, timeout=30, attempt_share=1)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            if state is None:
+                raise
+            logger.warning(f"Syncing records of {steam_id} ({mode}) failed, serving local copy: {e!r}")
+            return
+        if not isinstance(data, list):
+            # {"detail": ...} for players without records
+            data = []
+
+        rows = [record_row(record, steam_id, mode) for record in data]
+        watermarks = [row['created_on'] for row in rows]
+        if not full:
+            watermarks.append(state.watermark)
+        watermark = max(watermarks, default=None)
+
+        async with async_session() as session:
+            if full:
+                await session.exec(delete(Record).where(Record.steam_id == steam_id, Record.mode == mode))  # NOQA
+                await session.exec(delete(ServerUsage).where(ServerUsage.steam_id == steam_id, ServerUsage.mode == mode))  # NOQA
+                usage = self._usage_delta(rows, [])
+            else:
+                usage = await self._incremental_usage_delta(session, steam_id, mode, rows)
+            await self._apply_usage(session, steam_id, mode, usage)
+
+            for start in range(0, len(rows), self.batch_size):
+                await upsert(session, Record, rows[start:start + self.batch_size], commit=False)
+            await upsert(session, RecordSyncState, [{
+                'steam_id': steam_id,
+                'mode': mode,
+                'player_name': rows[-1]['player_name'] if rows else state.player_name if state else None,
+                'watermark': watermark,
+                'synced_at': now,
+                'full_synced_at': now if full else state.full_synced_at,
+            }], commit=False)
+            await session.commit()
+
+        if full:
+            self.full_syncs += 1
+        else:
+            self.incremental_syncs += 1
+        self.rows_written += len(rows)
+        logger.debug(f"Synced {len(rows)} records of {steam_id} ({mode}, {'full' if full else 'incremental'})")
+
+    @staticmethod
+    def _usage_delta(new_rows: list[dict], old_best: list[dict], new_best: list[dict] | None = None) -> Counter:
+        """
+        (scope, server) -> change in record count.
+        Every new record adds to `all`; for `top`, the personal bests that were replaced
+        are taken off their server and the new ones added.
+        """
+        delta = Counter()
+        for row in new_rows:
+            delta['all', row['server_name'] or ''] += 1
+        for row in old_best:
+            delta['top', row['server_name'] or ''] -= 1
+        for row in best_records(new_rows) if new_best is None else new_best:
+            delta['top', row['server_name'] or ''] += 1
+        return delta
+
+    async def _incremental_usage_delta(self, session, steam_id: str, mode: str, rows: list[dict]) -> Counter:
+        if not rows:
+            return Counter()
+        ids = [row['id'] for row in rows]
+        stored = set(await session.exec(select(Record.id).where(Record.id.in_(ids))))  # NOQA
+        new_rows = [row for row in rows if row['id'] not in stored]
+        if not new_rows:
+            return Counter()
+
+        # only the maps with new records can have a new personal best
+        statement = select(Record).where(
+            Record.steam_id == steam_id, Record.mode == mode,  # NOQA
+            Record.map_name.in_({row['map_name'] for row in new_rows}),  # NOQA
+        )
+        current = [record.model_dump() for record in await session.exec(statement)]
+        old_best = best_records(current)
+        return self._usage_delta(new_rows, old_best, best_records(current + new_rows))
+
+    @staticmethod
+    async def _apply_usage(session, steam_id: str, mode: str, delta: Counter):
+        rows = [
+            {'steam_id': steam_id, 'mode': mode, 'scope': scope, 'server_name': server_name, 'count': count}
+            for (scope, server_name), count in delta.items() if count
+        ]
+        if not rows:
+            return
+        await increment(session, ServerUsage, rows, 'count', commit=False)
+        await session.exec(delete(ServerUsage).where(
+            ServerUsage.steam_id == steam_id, ServerUsage.mode == mode, ServerUsage.count <= 0  # NOQA
+        ))
+
+    async def server_usage(self, steamid, mode, scope='top', limit=10, force_update=False) -> tuple[str | None, list[dict]]:
+        """
+        (player name, servers with the most records), in the shape of `count_servers`,
+        read from the aggregates instead of counting the records.
+        """
+        mode = format_kzmode(mode)
+        steam_id = await self.sync(steamid, mode, force_update)
+        where = (ServerUsage.steam_id == steam_id, ServerUsage.mode == mode, ServerUsage.scope == scope)  # NOQA
+        async with async_session() as session:
+            state = await session.get(RecordSyncState, (steam_id, mode))
+            total = (await session.exec(select(func.sum(ServerUsage.count)).where(*where))).one() or 0
+            usage = await session.exec(
+                select(ServerUsage).where(*where).order_by(ServerUsage.count.desc(), ServerUsage.server_name).limit(limit)
+            )
+            servers = [
+                {'server': row.server_name, 'count': row.count, 'per': round(row.count / total * 100, 2)}
+                for row in usage
+            ]
+        return (state.player_name if state else None), servers
+
+    async def records(self, steamid, mode, map_name=None, force_update=False) -> list[dict]:
+        """all records of a player, optionally on one map, as api-shaped dicts"""
+        mode = format_kzmode(mode)
+        steam_id = await self.sync(steamid, mode, force_update)
+        statement = select(Record).where(Record.steam_id == steam_id, Record.mode == mode)  # NOQA
+        if map_name:
+            statement = statement.where(Record.map_name == map_name)  # NOQA
+        async with async_session() as session:
+            return [record.to_dict() for record in await session.exec(statement)]
+
+    async def top_records(self, steamid, mode, force_update=False) -> list[dict]:
+        return best_records(await self.records(steamid, mode, force_update=force_update))
+
+    async def recent_best(self, steamid, mode, force_update=False) -> dict | None:
+        """the newest TP or PRO personal best"""
+        records = await self.top_records(steamid, mode, force_update)
+        return max(records, key=lambda record: record['created_on'], default=None)
+
+    def stats(self) -> dict:
+        return {
+            'full_syncs': self.full_syncs,
+            'incremental_syncs': self.incremental_syncs,
+            'rows_written': self.rows_written,
+        }
+
+
+record_store = RecordStore()
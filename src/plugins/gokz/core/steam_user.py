@@ -1,4 +1,6 @@
 import asyncio
+import re
+from functools import lru_cache
 
 import aiohttp
 from aiohttp import ClientTimeout
@@ -6,11 +8,78 @@ from steam.steamid import SteamID, from_url
 
 from nonebot import logger
 
+from src.plugins.gokz.api.helper import get_http_session
 from src.plugins.gokz.config import STEAM_API_KEY
 
 
-def convert_steamid(steamid, target_type: int | str = 2, url=False):
-    logger.debug(f"Converting SteamID: {steamid} to type: {target_type}")
+# steam64 of account 0 in the public universe: (universe 1 << 56) | (type Individual << 52) | (instance 1 << 32)
+INDIVIDUAL_STEAM64_BASE = 76561197960265728
+_STEAM2_PATTERN = re.compile(r"^STEAM_([01]):([01]):(\d+)$")
+_STEAM3_PATTERN = re.compile(r"^\[U:1:(\d{1,10})\]$")
+
+
+def _individual_account_id(steamid) -> int | None:
+    """
+    32-bit account id of a public individual account, computed with plain arithmetic.
+    Returns None for anything else (invalid ids, clans, other universes or instances),
+    which is then left to `steam.steamid.SteamID`.
+    """
+    value = str(steamid)
+    if value.isascii() and value.isdigit():
+        value = int(value)
+        if 0 < value < 2 ** 32:
+            return value
+        if value >> 32 == INDIVIDUAL_STEAM64_BASE >> 32 and value & 0xFFFFFFFF:
+            return value & 0xFFFFFFFF
+        return None
+
+    if match := _STEAM2_PATTERN.match(value):
+        account_id = (int(match.group(3)) << 1) | int(match.group(2))
+    elif match := _STEAM3_PATTERN.match(value):
+        account_id = int(match.group(1))
+    else:
+        return None
+    return account_id if 0 < account_id < 2 ** 32 else None
+
+
+@lru_cache(maxsize=8192, typed=True)
+def _convert_steamid(steamid, target_type, url):
+    # only logged on a memo miss, repeated conversions stay silent
+    logger.debug("Converting SteamID: {} to type: {}", steamid, target_type)
+    account_id = _individual_account_id(steamid)
+    if account_id is None:
+        return _convert_steamid_slow(steamid, target_type, url)
+
+    steam64 = INDIVIDUAL_STEAM64_BASE + account_id
+    if url:
+        return f"https://steamcommunity.com/profiles/{steam64}"
+
+    if target_type == '64':
+        return str(steam64)
+
+    target_type = int(target_type)
+
+    if target_type == 2:
+        return f"STEAM_1:{account_id & 1}:{account_id >> 1}"
+    if target_type == 3:
+        return f"[U:1:{account_id}]"
+    if target_type == 32:
+        return account_id
+    if target_type == 64:
+        return steam64
+    if target_type == 0:
+        return {
+            "steam2": f"STEAM_1:{account_id & 1}:{account_id >> 1}",
+            "steam3": f"[U:1:{account_id}]",
+            "steam64": steam64,
+            "steam32": account_id,
+            "url": f"https://steamcommunity.com/profiles/{steam64}",
+        }
+
+    raise ValueError(f"Invalid target type: {target_type}")
+
+
+def _convert_steamid_slow(steamid, target_type, url):
     steamid = SteamID(steamid)
     if steamid.is_valid() is False:
         raise ValueError(f"Invalid SteamID: {steamid}")
@@ -43,6 +112,12 @@ def convert_steamid(steamid, target_type: int | str = 2, url=False):
     raise ValueError(f"Invalid target type: {target_type}")
 
 
+def convert_steamid(steamid, target_type: int | str = 2, url=False):
+    result = _convert_steamid(steamid, target_type, url)
+    # the memoized dict is shared, hand out a copy
+    return dict(result) if isinstance(result, dict) else result
+
+
 async def retrieve_steamid(steamid_or_url) -> str | None:
     logger.debug(f"Retrieving SteamID from: {steamid_or_url}")
     steamid_or_url = str(steamid_or_url).strip()
@@ -71,9 +146,9 @@ async def check_steam_bans(steamid) -> dict | None:
 
     url = f'http://api.steampowered.com/ISteamUser/GetPlayerBans/v1/?key={STEAM_API_KEY}&steamids={steam64}'
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            ban_data = await response.json()
+    session = await get_http_session()
+    async with session.get(url) as response:
+        ban_data = await response.json()
     return ban_data['players'][0]
 
 
@@ -107,13 +182,13 @@ async def get_steam_user_info(steamid, timeout=5.0) -> dict | None:
     url = f"https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/?key={STEAM_API_KEY}&steamids={steamid}"
 
     try:
-        async with aiohttp.ClientSession(timeout=ClientTimeout(timeout)) as session:
-            async with session.get(url) as response:
-                try:
-                    data = await response.json()
-                except aiohttp.client_exceptions.ContentTypeError:
-                    logger.warning(f"Failed to get user info for SteamID: {steamid}")
-                    return None
+        session = await get_http_session()
+        async with session.get(url, timeout=ClientTimeout(timeout)) as response:
+            try:
+                data = await response.json()
+            except aiohttp.client_exceptions.ContentTypeError:
+                logger.warning(f"Failed to get user info for SteamID: {steamid}")
+                return None
     except asyncio.TimeoutError:
         logger.warning(f"Request to Steam API timed out for SteamID: {steamid}")
         return {"error": "Request timed out"}
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+from sqlalchemy.dialects.mysql import insert
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import Leaderboard, User, GroupMember
+
+LEADERBOARD_COLUMNS = frozenset(Leaderboard.model_fields) - {'updated_on', 'synced_at'}
+
+
+def parse_updated_on(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if value:
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return datetime.now()
+        # the table stores naive local time, like its CURRENT_TIMESTAMP default
+        return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+    return datetime.now()
+
+
+def leaderboard_row(data: dict) -> dict:
+    """keep only the columns of the `Leaderboard` table from an api.gokz.top leaderboard response"""
+    row = {key: data.get(key) for key in LEADERBOARD_COLUMNS}
+    row['updated_on'] = parse_updated_on(data.get('updated_on'))
+    row['synced_at'] = datetime.now()
+    return row
+
+
+async def upsert(session: AsyncSession, model: type[SQLModel], rows: list[dict], update_columns=None, commit=True):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE for a batch of rows in one statement.
+    Updates every non primary key column unless `update_columns` is given.
+    """
+    if not rows:
+        return
+    statement = insert(model).values(rows)
+    if update_columns is None:
+        primary_keys = {column.name for column in model.__table__.primary_key}
+        update_columns = [key for key in rows[0] if key not in primary_keys]
+    statement = statement.on_duplicate_key_update({key: statement.inserted[key] for key in update_columns})
+    await session.exec(statement)
+    if commit:
+        await session.commit()
+
+
+async def increment(session: AsyncSession, model: type[SQLModel], rows: list[dict], column: str, commit=True):
+    """insert the rows, or add their `column` value onto the existing row's"""
+    if not rows:
+        return
+    statement = insert(model).values(rows)
+    statement = statement.on_duplicate_key_update({column: getattr(model, column) + statement.inserted[column]})
+    await session.exec(statement)
+    if commit:
+        await session.commit()
+
+
+async def get_leaderboard(session: AsyncSession, steamid: str) -> Leaderboard | None:
+    return await session.get(Leaderboard, steamid)
+
+
+async def upsert_leaderboards(session: AsyncSession, players: list[dict]):
+    await upsert(session, Leaderboard, [leaderboard_row(player) for player in players])
+
+
+GROUP_RANK_ORDERS = {
+    'pts_skill': Leaderboard.pts_skill,
+    'total_points': Leaderboard.total_points,
+}
+
+
+def group_ranking_statement(group_openid: str, order_by='pts_skill', limit=20):
+    """
+    群成员 -> qqbot_users -> leaderboard, one join where every step is a primary key lookup:
+    the (group_openid, qid) key of qqbot_group_members, then qqbot_users.qid, then leaderboard.steamid.
+    Only the group's own rows get sorted.
+    """
+    column = GROUP_RANK_ORDERS[order_by]
+    return (
+        select(User.qid, Leaderboard.name, Leaderboard.steamid, Leaderboard.pts_skill,
+               Leaderboard.total_points, Leaderboard.rank_name)
+        .select_from(GroupMember)
+        .join(User, User.qid == GroupMember.qid)  # NOQA
+        .join(Leaderboard, Leaderboard.steamid == User.steamid)  # NOQA
+        .where(GroupMember.group_openid == group_openid, column.is_not(None))  # NOQA
+        .order_by(column.desc())
+        .limit(limit)
+    )
+
+
+async def get_group_ranking(session: AsyncSession, group_openid: str, order_by='pts_skill', limit=20) -> list:
+    return list(await session.exec(group_ranking_statement(group_openid, order_by, limit)))
+
+
+async def remember_group_member(session: AsyncSession, group_openid: str, qid: str):
+    row = {'group_openid': group_openid, 'qid': qid, 'last_seen': datetime.now()}
+    await upsert(session, GroupMember, [row], update_columns=['last_seen'])
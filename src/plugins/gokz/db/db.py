@@ -2,21 +2,40 @@ import os
 import urllib.parse
 
 from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 load_dotenv()
 
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", 10))
+POOL_MAX_OVERFLOW = int(os.getenv("MYSQL_POOL_MAX_OVERFLOW", 10))
+POOL_RECYCLE = 1800  # below MySQL's wait_timeout, so idle connections are never found dead
 
-def get_url():
+
+def get_url(driver="pymysql"):
     user = os.getenv("MYSQL_USER", "root")
     password = urllib.parse.quote_plus(os.getenv("MYSQL_PASSWORD", ""))
     server = os.getenv("MYSQL_SERVER", "localhost")
     port = os.getenv("MYSQL_PORT", "3306")
     db_name = os.getenv("MYSQL_DB", "app")
-    return f"mysql+pymysql://{user}:{password}@{server}:{port}/{db_name}"
+    return f"mysql+{driver}://{user}:{password}@{server}:{port}/{db_name}"
+
+
+engine = create_engine(get_url(), pool_pre_ping=True, pool_recycle=POOL_RECYCLE)
+
+# used from command handlers, so a slow query doesn't stall the event loop
+async_engine = create_async_engine(
+    get_url("aiomysql"),
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=POOL_RECYCLE,
+)
 
 
-engine = create_engine(get_url())
+def async_session() -> AsyncSession:
+    return AsyncSession(async_engine, expire_on_commit=False)
 
 
 def create_db_and_tables():
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlmodel import Field, SQLModel, Column, DateTime, func
+from sqlmodel import Field, SQLModel, Column, DateTime, Index, func
 
 
 class User(SQLModel, table=True):
@@ -41,3 +41,63 @@ class Leaderboard(SQLModel, table=True):
     count_pro: int | None = Field(default=None)
     count_tp: int | None = Field(default=None)
     updated_on: datetime = Field(default_factory=datetime.now, sa_column_kwargs={"server_default": "CURRENT_TIMESTAMP", "onupdate": "CURRENT_TIMESTAMP"})
+    # 本地写入时间, updated_on 是上游计算排行的时间
+    synced_at: datetime | None = Field(default=None)
+
+
+class GroupMember(SQLModel, table=True):
+    """在群里用过指令的用户, 主键以 group_openid 开头, 按群查成员走主键索引"""
+    __tablename__ = 'qqbot_group_members'
+    group_openid: str = Field(primary_key=True, max_length=64)
+    qid: str = Field(primary_key=True, max_length=64)
+    last_seen: datetime = Field(default_factory=datetime.now, sa_column=Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False))
+
+
+class Record(SQLModel, table=True):
+    """api.gokz.top 的玩家记录, 字段同 `schema.record.GlobalRecord`"""
+    __tablename__ = 'gokz_records'
+    __table_args__ = (Index('ix_gokz_records_player', 'steam_id', 'mode', 'map_name'),)
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    player_name: str | None = Field(default=None, max_length=255)
+    steam_id: str = Field(max_length=30)
+    server_id: int | None = Field(default=None)
+    map_id: int | None = Field(default=None)
+    stage: int = Field(default=0)
+    mode: str = Field(max_length=20)
+    time: float
+    teleports: int = Field(default=0)
+    created_on: datetime
+    server_name: str | None = Field(default=None, max_length=255)
+    map_name: str = Field(max_length=255)
+    tier: int | None = Field(default=None)
+    points: int = Field(default=0)
+
+    def to_dict(self) -> dict:
+        """same shape as the api response, so handlers work on either"""
+        data = self.model_dump()
+        data['created_on'] = self.created_on.isoformat(timespec='seconds')
+        return data
+
+
+class RecordSyncState(SQLModel, table=True):
+    """每个玩家每个模式的记录同步进度"""
+    __tablename__ = 'gokz_record_sync'
+    steam_id: str = Field(primary_key=True, max_length=30)
+    mode: str = Field(primary_key=True, max_length=20)
+    player_name: str | None = Field(default=None, max_length=255)
+    watermark: datetime | None = Field(default=None)  # newest created_on stored locally
+    synced_at: datetime
+    full_synced_at: datetime
+
+
+class ServerUsage(SQLModel, table=True):
+    """
+    每个玩家在各服务器的记录数, 随记录同步增量更新.
+    scope: all 所有记录, top 每张图的 TP/PRO 最佳记录
+    """
+    __tablename__ = 'gokz_server_usage'
+    steam_id: str = Field(primary_key=True, max_length=30)
+    mode: str = Field(primary_key=True, max_length=20)
+    scope: str = Field(primary_key=True, max_length=10)
+    server_name: str = Field(primary_key=True, max_length=255)
+    count: int = Field(default=0)
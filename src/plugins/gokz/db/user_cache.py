@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from .db import async_session
+from .models import User
+
+
+@dataclass(frozen=True, slots=True)
+class UserProfile:
+    qid: str
+    name: str
+    steamid: str
+    mode: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserProfile":
+        return cls(qid=user.qid, name=user.name, steamid=user.steamid, mode=user.mode)
+
+
+class UserCache:
+    """
+    LRU of qid -> bound profile, so resolving the caller of a command usually skips MySQL.
+    Unbound qids are cached too (as None) for a shorter time.
+    /bind and /mode write through with `put`, the TTLs only catch changes made outside the bot.
+    """
+
+    def __init__(self, maxsize=4096, ttl=600, negative_ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[UserProfile | None, float]] = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    async def get(self, qid: str) -> UserProfile | None:
+        entry = self._entries.get(qid)
+        if entry is not None:
+            profile, stored_at = entry
+            ttl = self.ttl if profile else self.negative_ttl
+            if time.monotonic() - stored_at <= ttl:
+                self._entries.move_to_end(qid)
+                if profile:
+                    self.hits += 1
+                else:
+                    self.negative_hits += 1
+                return profile
+
+        self.misses += 1
+        async with async_session() as session:
+            user = await session.get(User, qid)
+        profile = UserProfile.from_user(user) if user else None
+        self._store(qid, profile)
+        return profile
+
+    def put(self, user: User):
+        self._store(user.qid, UserProfile.from_user(user))
+
+    def invalidate(self, qid: str):
+        self._entries.pop(qid, None)
+
+    def _store(self, qid: str, profile: UserProfile | None):
+        self._entries[qid] = (profile, time.monotonic())
+        self._entries.move_to_end(qid)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+user_cache = UserCache()
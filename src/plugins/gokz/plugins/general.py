@@ -2,36 +2,83 @@ import json
 from pathlib import Path
 from textwrap import dedent
 
-import httpx
 from nonebot import on_command
 from nonebot.adapters.qq import Bot, MessageEvent, Message, MessageSegment
 from nonebot.params import CommandArg
+from nonebot.permission import SUPERUSER
 from sqlalchemy.exc import NoResultFound
-from sqlmodel import Session, select
+from sqlmodel import select
 
 from src.plugins.gokz.core.kreedz import format_kzmode
 from src.plugins.gokz.core.steam_user import convert_steamid
-from ..api.helper import fetch_json
+from ..api.cache import response_cache
+from ..api.leaderboard_refresh import leaderboard_refresher
+from ..api.resilience import circuit_stats
+from ..core.admission import admission, HEAVY, LIGHT
 from ..core.command_helper import CommandData
-from ..db.db import engine, create_db_and_tables
+from ..core.kz.image_cache import screenshot_cache
+from ..core.record_store import record_store
+from ..db.db import async_session, create_db_and_tables
 from ..db.models import User, Leaderboard
+from ..db.user_cache import user_cache
 
 create_db_and_tables()
 
+# 前20玩家 steamid -> 昵称, 启动时读取一次
+with open("data/gokz/json/top20_players.json", encoding="utf-8") as f:
+    TOP20_PLAYERS = {player["steamid"]: player["name"] for player in json.load(f)}
 
 bind = on_command("bind", aliases={"绑定"})
 mode = on_command("mode", aliases={"模式"})
 test = on_command("test")
 help_ = on_command('help', aliases={"帮助"})
 info = on_command("info")
+cache_stats = on_command("cache", permission=SUPERUSER)
+
+
+@cache_stats.handle()
+async def _():
+    stats = response_cache.stats()
+    users = user_cache.stats()
+    images = screenshot_cache.stats()
+    records = record_store.stats()
+    content = dedent(f"""
+        ════接口缓存════
+        条目:　　{stats['size']}/{stats['maxsize']}
+        命中:　　{stats['hits']}
+        过期命中:{stats['stale_hits']}
+        未命中:　{stats['misses']}
+        命中率:　{stats['hit_ratio']:.2%}
+        ════用户缓存════
+        条目:　　{users['size']}/{users['maxsize']}
+        命中:　　{users['hits']} (未绑定 {users['negative_hits']})
+        未命中:　{users['misses']}
+        命中率:　{users['hit_ratio']:.2%}
+        ════截图缓存════
+        图片:　　{images['entries']}张 ({images['format']})
+        占用:　　{images['bytes'] / 1024 / 1024:.1f}/{images['max_bytes'] / 1024 / 1024:.0f} MB
+        淘汰:　　{images['evictions']}
+        ════记录同步════
+        全量:　　{records['full_syncs']}
+        增量:　　{records['incremental_syncs']}
+        写入:　　{records['rows_written']}条
+    """).strip()
+    circuits = circuit_stats()
+    if circuits:
+        content += '\n════上游接口════'
+        for host, circuit in circuits.items():
+            content += f"\n{host}: {circuit['state']} | 拒绝{circuit['rejected']} | p95 {circuit['p95_ms'] or '-'}ms"
+    await cache_stats.finish(content)
 
 
 @info.handle()
+@admission(LIGHT)
 async def _(event: MessageEvent, args: Message = CommandArg()):
-    cd = CommandData(event, args)
-    with Session(engine) as session:
-        statement = select(User).where(User.qid == cd.qid)  # NOQA
-        user: User = session.exec(statement).one()
+    cd = await CommandData.create(event, args)
+    if cd.error:
+        return await info.finish(cd.error)
+
+    user = await user_cache.get(cd.qid)
 
     content = dedent(f"""
         昵称:             {user.name}
@@ -51,6 +98,7 @@ async def _():
 
 
 @bind.handle()
+@admission(HEAVY)
 async def bind_steamid(event: MessageEvent, args: Message = CommandArg()):
     if steamid := args.extract_plain_text():
         try:
@@ -61,42 +109,39 @@ async def bind_steamid(event: MessageEvent, args: Message = CommandArg()):
         return await bind.finish("请输steamid")
 
     # 阻止他们绑定前20玩家的steamid
-    top20 = json.load(open("data/gokz/json/top20_players.json"))
-    for player in top20:
-        if steamid == player["steamid"]:
-            return await bind.finish(f"你是 {player['name']} 吗, 你就绑")
-
-    url = f'http://localhost:8000/leaderboard/{steamid}?mode=kz_timer'
-    with Session(engine) as session:
-        rank: Leaderboard = session.get(Leaderboard, steamid)  # NOQA
+    if steamid in TOP20_PLAYERS:
+        return await bind.finish(f"你是 {TOP20_PLAYERS[steamid]} 吗, 你就绑")
+
+    async with async_session() as session:
+        rank: Leaderboard = await session.get(Leaderboard, steamid)  # NOQA
         if not rank:
-            httpx.put(url)
-            rank: Leaderboard = session.get(Leaderboard, steamid)  # NOQA
+            await leaderboard_refresher.refresh(steamid, 'kz_timer')
+            rank: Leaderboard = await session.get(Leaderboard, steamid)  # NOQA
             if not rank:
                 return await bind.finish("用户不存在. 你至少上传过一次KZT的记录吗?")
 
     user_id = event.get_user_id()
-    rank_data = await fetch_json(url, timeout=10)
-    qq_name = rank_data["name"]
+    qq_name = rank.name
 
-    with Session(engine) as session:
+    async with async_session() as session:
         # 阻止重复绑定
         try:
             statement = select(User).where(User.steamid == steamid)  # NOQA
-            exist_user: User = session.exec(statement).one()
+            exist_user: User = (await session.exec(statement)).one()
             return await bind.finish(f"该steamid已经被 {exist_user.name} QQ号{exist_user.qid} 绑定 ")
         except NoResultFound:
             pass
 
-        user = session.get(User, user_id)
+        user = await session.get(User, user_id)
         if user:
             user.name = qq_name
             user.steamid = steamid
         else:
             user = User(qid=user_id, name=qq_name, steamid=steamid)
             session.add(user)
-        session.commit()
-        session.refresh(user)
+        await session.commit()
+        await session.refresh(user)
+        user_cache.put(user)
 
     content = dedent(f"""
         绑定成功 {rank.name}!
@@ -118,14 +163,15 @@ async def update_mode(event: MessageEvent, args: Message = CommandArg()):
         return await mode.finish("你模式都不给我我怎么帮你改ヽ(ー_ー)ノ")
 
     qid = event.get_user_id()
-    with Session(engine) as session:
-        user: User | None = session.get(User, qid)
+    async with async_session() as session:
+        user: User | None = await session.get(User, qid)
         if not user:
             return await mode.finish("你还未绑定steamid")
 
         user.mode = mode_
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        await session.commit()
+        await session.refresh(user)
+        user_cache.put(user)
 
     await mode.finish(f"模式已更新为: {mode_}")
@@ -1,18 +1,28 @@
+import asyncio
 from datetime import datetime
 from textwrap import dedent
 
-import httpx
+import aiohttp
 from nonebot import on_command, logger
 from nonebot.adapters.qq import MessageEvent as Event, Message
 from nonebot.params import CommandArg
 from nonebot.permission import SUPERUSER
 
+from src.plugins.gokz.core.admission import admission, HEAVY, LIGHT
 from src.plugins.gokz.core.command_helper import CommandData
-from src.plugins.gokz.core.formatter import format_gruntime, diff_seconds_to_time
+from src.plugins.gokz.core.formatter import format_gruntime, diff_seconds_to_time, format_age
 from src.plugins.gokz.core.kreedz import search_map
-from src.plugins.gokz.core.kz.records import count_servers
+from src.plugins.gokz.core.kz.records import compare_maps, progress_history
+from src.plugins.gokz.core.record_store import record_store
+from src.plugins.gokz.core.steam_user import convert_steamid
+from ..api.cache import TTL_PLAYER_SEARCH, TTL_RECORDS, TTL_LEADERBOARD
 from ..api.dataclasses import LeaderboardData
 from ..api.helper import fetch_json
+from ..api.leaderboard_refresh import leaderboard_refresher
+from ..config import RANK_LOCAL_MAX_AGE
+from ..db.crud import get_leaderboard, upsert_leaderboards, parse_updated_on, get_group_ranking
+from ..db.db import async_session
+from ..db.models import Leaderboard
 
 BASE = "https://api.gokz.top/"
 
@@ -24,10 +34,97 @@ find = on_command('find', aliases={'查找'})
 group_rank = on_command('群排名', aliases={'group_rank'}, permission=SUPERUSER)
 
 
+@group_rank.handle()
+@admission(LIGHT)
+async def group_rank_handle(event: Event, args: Message = CommandArg()):
+    group_openid = getattr(event, 'group_openid', None)
+    if not group_openid:
+        return await group_rank.finish("请在群里使用")
+
+    # 本地 leaderboard 表只有 kz_timer 的数据
+    order_by = 'total_points' if args.extract_plain_text().strip() in ('总分', 'points') else 'pts_skill'
+    async with async_session() as session:
+        rows = await get_group_ranking(session, group_openid, order_by)
+    if not rows:
+        return await group_rank.finish("本群还没有已绑定玩家的排行数据")
+
+    content = f"════群排名 KZT {'总分' if order_by == 'total_points' else 'Rating'}════\n"
+    for idx, row in enumerate(rows):
+        content += f"{idx+1}. {row.name} | {row.pts_skill} | {(row.total_points or 0)//10000}w分\n"
+    await group_rank.finish(content.strip())
+
+
+# (字段, 显示名)
+PK_FIELDS = (
+    ('pts_skill', 'Rating'),
+    ('total_points', '总分'),
+    ('count', '地图数'),
+    ('count_t5', 'T5'),
+    ('count_t6', 'T6'),
+    ('count_t7', 'T7'),
+    ('count_p1000_tp', 'TP满分'),
+    ('count_p1000_pro', 'PRO满分'),
+)
+
+
+def format_pk_diff(value1, value2) -> str:
+    if value1 is None or value2 is None:
+        return f"{value1 if value1 is not None else '-'} vs {value2 if value2 is not None else '-'}"
+    diff = round(value1 - value2, 2)
+    return f"{value1} vs {value2} ({'+' if diff > 0 else ''}{diff})"
+
+
+@pk.handle()
+@admission(HEAVY)
+async def pk_handle(event: Event, args: Message = CommandArg()):
+    cd = await CommandData.create(event, args)
+    if cd.error:
+        return await pk.finish(cd.error)
+    if not cd.steamid2:
+        return await pk.finish("请 @对手 或者用 -s 指定对手的steamid")
+
+    me, rival = cd.steamid2, cd.steamid
+    # 两人的排行和记录同时请求, 耗时取决于最慢的那一个
+    try:
+        (rank1, rank2), (records1, records2) = await asyncio.gather(
+            fetch_json(
+                f'{BASE}leaderboard/{me}?mode={cd.mode}', f'{BASE}leaderboard/{rival}?mode={cd.mode}',
+                timeout=10, ttl=TTL_LEADERBOARD, force_update=cd.update,
+            ),
+            fetch_json(
+                f'{BASE}records/top/{me}?mode={cd.mode}', f'{BASE}records/top/{rival}?mode={cd.mode}',
+                ttl=TTL_RECORDS, force_update=cd.update,
+            ),
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.warning(f"pk {me} vs {rival} failed: {e!r}")
+        return await pk.finish("获取数据失败，请稍后再试。")
+
+    for rank_data in (rank1, rank2):
+        if not isinstance(rank_data, dict) or rank_data.get('detail'):
+            return await pk.finish(rank_data.get('detail') if isinstance(rank_data, dict) else "获取数据失败，请稍后再试。")
+    data1, data2 = LeaderboardData.from_dict(rank1), LeaderboardData.from_dict(rank2)
+
+    content = f"════PK {cd.mode}════\n{data1.name} vs {data2.name}\n"
+    for field_name, label in PK_FIELDS:
+        content += f"{label}: {format_pk_diff(getattr(data1, field_name), getattr(data2, field_name))}\n"
+
+    maps = compare_maps(*(records if isinstance(records, list) else [] for records in (records1, records2)))
+    content += dedent(f"""
+        ════地图════
+        共同完成: {maps['shared']}张
+        仅{data1.name}: {maps['only1']}张
+        仅{data2.name}: {maps['only2']}张
+        共同地图分数更高: {maps['wins1']} vs {maps['wins2']} (平 {maps['draws']})
+    """).strip()
+    await pk.finish(content)
+
+
 @find.handle()
+@admission(LIGHT)
 async def find_handle(event: Event, args: Message = CommandArg()):
     if name := args.extract_plain_text():
-        players = await fetch_json(f"https://api.gokz.top/leaderboard/search/{name}?mode=kz_timer")
+        players = await fetch_json(f"https://api.gokz.top/leaderboard/search/{name}?mode=kz_timer", ttl=TTL_PLAYER_SEARCH)
         players = [LeaderboardData.from_dict(player) for player in players]
 
         content = '════查找玩家════\n'
@@ -41,22 +138,20 @@ async def find_handle(event: Event, args: Message = CommandArg()):
 
 
 @ccf.handle()
+@admission(HEAVY)
 async def check_cheng_fen(event: Event, args: Message = CommandArg()):
-    cd = CommandData(event, args)
+    cd = await CommandData.create(event, args)
     if cd.error:
         return await ccf.finish(cd.error)
 
-    url = f'{BASE}records/top/{cd.steamid}?mode={cd.mode}'
-    if cd.args:
-        if cd.args[0] == 'all':
-            url = f'{BASE}records/{cd.steamid}?mode={cd.mode}'
-
-    records = await fetch_json(url)
-    data = count_servers(records, limit=10)
+    scope = 'all' if cd.args and cd.args[0] == 'all' else 'top'
+    player_name, data = await record_store.server_usage(cd.steamid, cd.mode, scope, limit=10, force_update=cd.update)
+    if not data:
+        return await ccf.finish("该玩家还没有记录")
     content = dedent(f"""
         ════成分查询════
-        玩家:　　{records[0]['player_name']}
-        steamid: {records[0]['steam_id']}
+        玩家:　　{player_name}
+        steamid: {convert_steamid(cd.steamid)}
         模式:　　{cd.mode}
         ════════════
     """).strip() + '\n'
@@ -65,20 +160,69 @@ async def check_cheng_fen(event: Event, args: Message = CommandArg()):
     return await ccf.finish(content)
 
 
+def format_rank(data: LeaderboardData, mode: str, age: float, note: str = '') -> str:
+    content = dedent(
+        f"""
+        昵称:　　　{data.name}
+        steamid:　 {data.steamid}
+        模式:　　　{mode}
+        Rating:　　{data.pts_skill}
+        段位:　　　{data.rank_name}
+        排名:　　　{f'No.{data.rank}' if data.rank else '-'}
+        百分比:　　{data.percentage or '-'}
+        总分:　　　{data.total_points}
+        地图数:　　{data.count}
+        平均分:　　{data.pts_avg}
+        常玩服务器:{data.most_played_server}
+        上次更新:　{str(data.updated_on).replace('T', ' ')} ({format_age(age)})
+        """
+    ).strip()
+    if note:
+        content += f"\n{note}"
+    return '\n' + content
+
+
+def local_rank_data(row: Leaderboard) -> LeaderboardData:
+    # 本地表没有排名和百分比
+    return LeaderboardData.from_dict({**row.model_dump(), 'updated_on': row.updated_on.isoformat(sep=' ', timespec='seconds')})
+
+
 @rank.handle()
+@admission(LIGHT)
 async def gokz_top_rank(event: Event, args: Message = CommandArg()):
-    cd = CommandData(event, args)
-    print(cd.update)
+    cd = await CommandData.create(event, args)
     if cd.error:
         return await rank.finish(cd.error)
 
     if cd.update:
-        httpx.put(f'http://localhost:8000/leaderboard/{cd.steamid}?mode={cd.mode}')
+        await leaderboard_refresher.refresh(cd.steamid, cd.mode)
+
+    # 本地 leaderboard 表只有 kz_timer, 以 steamid2 为主键
+    local = None
+    if cd.mode == 'kz_timer':
+        try:
+            steamid = convert_steamid(cd.steamid)
+        except ValueError:
+            return await rank.finish("Steamid格式不正确")
+        async with async_session() as session:
+            local = await get_leaderboard(session, steamid)
+        # fresh means written here recently, upstream's updated_on can be days old for inactive players
+        if local and local.synced_at and not cd.update:
+            if (datetime.now() - local.synced_at).total_seconds() <= RANK_LOCAL_MAX_AGE:
+                age = (datetime.now() - local.updated_on).total_seconds()
+                return await rank.finish(format_rank(local_rank_data(local), cd.mode, age))
 
     url = f'{BASE}leaderboard/{cd.steamid}?mode={cd.mode}'
-    logger.warning(f"querying {url} failed")
     try:
-        rank_data = await fetch_json(url, timeout=10)
+        rank_data = await fetch_json(url, timeout=10, ttl=TTL_LEADERBOARD, force_update=cd.update)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.warning(f"querying {url} failed: {e!r}")
+        if local:
+            age = (datetime.now() - local.updated_on).total_seconds()
+            return await rank.finish(format_rank(local_rank_data(local), cd.mode, age, "接口请求失败, 以上为本地缓存数据"))
+        return await rank.finish("获取数据失败，请稍后再试。")
+
+    try:
         if rank_data.get('detail'):
             return await rank.finish(rank_data.get('detail'))
         data = LeaderboardData.from_dict(rank_data)
@@ -87,60 +231,39 @@ async def gokz_top_rank(event: Event, args: Message = CommandArg()):
     except KeyError:
         return await rank.finish("无法解析排行榜数据，请稍后再试。")
 
-    content = dedent(
-        f"""     
-        昵称:　　　{data.name}
-        steamid:　 {data.steamid}
-        模式:　　　{cd.mode}
-        Rating:　　{data.pts_skill}
-        段位:　　　{data.rank_name}
-        排名:　　　No.{data.rank}
-        百分比:　　{data.percentage}
-        总分:　　　{data.total_points}
-        地图数:　　{data.count}
-        平均分:　　{data.pts_avg}
-        常玩服务器:{data.most_played_server}
-        上次更新:　{data.updated_on.replace('T', ' ')}
-        """
-    ).strip()
-    return await rank.finish('\n' + content)
+    if cd.mode == 'kz_timer' and data.steamid:
+        try:
+            async with async_session() as session:
+                await upsert_leaderboards(session, [rank_data])
+        except Exception as e:
+            logger.warning(f"Saving leaderboard row of {data.steamid} failed: {e!r}")
+
+    age = (datetime.now() - parse_updated_on(data.updated_on)).total_seconds()
+    return await rank.finish(format_rank(data, cd.mode, age))
 
 
 @progress.handle()
+@admission(HEAVY)
 async def map_progress(event: Event, args: Message = CommandArg()):
-    cd = CommandData(event, args)
+    cd = await CommandData.create(event, args)
     if cd.error:
         return await progress.finish(cd.error)
 
     map_name = search_map(cd.args[0])[0]
 
-    query_url = (
-        f"https://api.gokz.top/records/{cd.steamid}?mode={cd.mode}&map_name={map_name}"
-    )
-    data = await fetch_json(query_url)
+    data = await record_store.records(cd.steamid, cd.mode, map_name=map_name, force_update=cd.update)
+    data = [record for record in data if not record['stage']]  # main course only
 
     if not data:
         return await progress.finish(f"你尚未完成过{map_name}")
 
-    data.sort(key=lambda x: x['created_on'])
-    records = []
-    completions = []
-    completions_counter = 0
-    for record in data:
-        if not records or record['time'] < records[-1]['time']:
-            records.append(record)
-            completions.append(completions_counter)
-            completions_counter = 0
-        else:
-            completions_counter += 1
-
-    records = list(reversed(records))
-    completions = list(reversed(completions))
+    records, completions = progress_history(data)
 
     tp_records = [record for record in records if record['teleports'] > 0]
     pro_records = [record for record in records if record['teleports'] == 0]
 
-    content = f"玩家: {data[0]['player_name']}\n在地图: {data[0]['map_name']}\n模式: {data[0]['mode']} 的进度\n"
+    first = records[-1]  # the oldest record
+    content = f"玩家: {first['player_name']}\n在地图: {first['map_name']}\n模式: {first['mode']} 的进度\n"
 
     def generate_content(records_, completions_, title):
         content_ = f"====={title}=====\n"
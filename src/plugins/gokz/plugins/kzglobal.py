@@ -1,21 +1,25 @@
+import asyncio
 from datetime import datetime
 from pathlib import Path
 from textwrap import dedent
 from zoneinfo import ZoneInfo
 
+import aiohttp
 from nonebot import on_command, logger
 from nonebot.adapters.qq import Bot, Event, Message, MessageSegment
 from nonebot.params import CommandArg
 from nonebot.permission import SUPERUSER
 
-from ..api.kztimerglobal import fetch_personal_best, fetch_personal_recent, fetch_world_record, fetch_personal_bans, \
-    update_map_data
+from ..api.kztimerglobal import fetch_personal_best, fetch_world_record, fetch_personal_bans, update_map_data
 from src.plugins.gokz.core.command_helper import CommandData
+from src.plugins.gokz.core.admission import admission, admitted, RENDER, HEAVY, LIGHT
 from src.plugins.gokz.core.config import MAP_TIERS
 from src.plugins.gokz.core.formatter import format_gruntime, record_format_time
 from src.plugins.gokz.core.kreedz import search_map
-from src.plugins.gokz.core.kz.screenshot import vnl_screenshot_async, kzgoeu_screenshot_async
+from src.plugins.gokz.core.kz.card import native_card_async, cached_card, CardFontMissing
+from src.plugins.gokz.core.kz.screenshot import vnl_screenshot_async, kzgoeu_screenshot_async, cached_screenshot
 from src.plugins.gokz.core.map_img_url import get_map_img_url
+from src.plugins.gokz.core.record_store import record_store
 
 pb = on_command('pb', aliases={'personal-best'})
 pr = on_command('pr')
@@ -32,8 +36,15 @@ DEFAULT_MAP = 'bkz_cakewalk'
 
 @update_map_info.handle()
 async def _():
-    await update_map_data()
-    await update_map_info.finish('更新完成')
+    try:
+        added, removed = await update_map_data(force_update=True)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.error(f"Updating the map list failed: {e!r}")
+        return await update_map_info.finish('更新失败, 地图列表未改动')
+    content = f'更新完成, 新增{len(added)}张地图, 移除{len(removed)}张地图'
+    if added:
+        content += '\n' + ', '.join(sorted(added))
+    await update_map_info.finish(content)
 
 
 def convert_to_shanghai_time(date_str):
@@ -50,12 +61,13 @@ def convert_to_shanghai_time(date_str):
 
 
 @ban_.handle()
+@admission(LIGHT)
 async def _(event: Event, args: Message = CommandArg()):
-    cd = CommandData(event, args)
+    cd = await CommandData.create(event, args)
     if cd.error:
         return await ban_.send(cd.error)
 
-    bans = await fetch_personal_bans(steamid64=cd.steamid)
+    bans = await fetch_personal_bans(steamid64=cd.steamid, force_update=cd.update)
 
     if not bans:
         return await ban_.finish(f"{cd.steamid} 没有找到任何封禁记录。", at_sender=True)
@@ -86,8 +98,9 @@ async def _(event: Event, args: Message = CommandArg()):
 
 
 @wr.handle()
+@admission(LIGHT)
 async def _(event: Event, args: Message = CommandArg()):
-    cd = CommandData(event, args)
+    cd = await CommandData.create(event, args)
     if cd.error:
         return await wr.finish(cd.error)
 
@@ -106,7 +119,7 @@ async def _(event: Event, args: Message = CommandArg()):
     """).strip()
 
     try:
-        data = await fetch_world_record(map_name, mode=kz_mode, has_tp=True)
+        data = await fetch_world_record(map_name, mode=kz_mode, has_tp=True, force_update=cd.update)
         content += dedent(f"""
             ║ {data['steam_id']}
             ║ 昵称:　　{data['player_name']}
@@ -120,7 +133,7 @@ async def _(event: Event, args: Message = CommandArg()):
 
     content += f"\n╠═════裸跳记录═════"
     try:
-        pro = await fetch_world_record(map_name, mode=kz_mode, has_tp=False)
+        pro = await fetch_world_record(map_name, mode=kz_mode, has_tp=False, force_update=cd.update)
         content += dedent(f"""
             ║ {pro['steam_id']}
             ║ 昵称:　　{pro['player_name']}
@@ -140,12 +153,15 @@ async def _(event: Event, args: Message = CommandArg()):
 
 
 @pr.handle()
+@admission(HEAVY)
 async def handle_pr(bot: Bot, event: Event, args: Message = CommandArg()):
-    cd = CommandData(event, args)
+    cd = await CommandData.create(event, args)
     if cd.error:
         return await pr.finish(cd.error)
 
-    data = await fetch_personal_recent(cd.steamid, cd.mode)
+    data = await record_store.recent_best(cd.steamid, cd.mode, force_update=cd.update)
+    if not data:
+        return await pr.finish("该玩家还没有记录")
 
     content = dedent(f"""
         ╔ 地图:　　{data['map_name']}
@@ -164,8 +180,9 @@ async def handle_pr(bot: Bot, event: Event, args: Message = CommandArg()):
 
 
 @pb.handle()
+@admission(LIGHT)
 async def map_pb(bot: Bot, event: Event, args: Message = CommandArg()):
-    cd = CommandData(event, args)
+    cd = await CommandData.create(event, args)
     if cd.error:
         return await pb.finish(cd.error)
 
@@ -181,7 +198,7 @@ async def map_pb(bot: Bot, event: Event, args: Message = CommandArg()):
         ╠═════存点记录═════""").strip()
 
     try:
-        data = await fetch_personal_best(cd.steamid, map_name, cd.mode)
+        data = await fetch_personal_best(cd.steamid, map_name, cd.mode, force_update=cd.update)
         if data:
             content += dedent(f"""
                 ║ 玩家:　　{data['player_name']}
@@ -199,7 +216,7 @@ async def map_pb(bot: Bot, event: Event, args: Message = CommandArg()):
     content += f"\n╠═════裸跳记录═════"
 
     try:
-        pro = await fetch_personal_best(cd.steamid, map_name, cd.mode, has_tp=False)
+        pro = await fetch_personal_best(cd.steamid, map_name, cd.mode, has_tp=False, force_update=cd.update)
         if pro:
             content += dedent(f"""
                 ║ 玩家:　　{pro['player_name']}
@@ -220,16 +237,33 @@ async def map_pb(bot: Bot, event: Event, args: Message = CommandArg()):
 
 @kz.handle()
 async def handle_kz(bot: Bot, event: Event, args: Message = CommandArg()):
-    cd = CommandData(event, args)
+    cd = await CommandData.create(event, args)
     if cd.error:
         return await bot.send(event, cd.error)
 
-    if cd.mode == "kz_vanilla":
-        await bot.send(event, "客服小祥正在为您: 生成vnl-kz图片...")
-        url = await vnl_screenshot_async(cd.steamid, force_update=cd.update)
+    # only a real render takes a browser slot, a cache hit or the Pillow card costs far less
+    card = bool(cd.args) and cd.args[0] in ('card', '卡片')
+    if card and not cd.update and (cached := cached_card(cd.steamid, cd.mode)):
+        async with admitted(event, LIGHT):
+            url = cached
+    elif card:
+        async with admitted(event, HEAVY):
+            try:
+                url = await native_card_async(cd.steamid, cd.mode, force_update=cd.update)
+            except CardFontMissing as e:
+                logger.error(str(e))
+                return await bot.send(event, "卡片模式暂不可用, 请联系管理员")
+    elif not cd.update and (cached := cached_screenshot(cd.steamid, cd.mode)):
+        async with admitted(event, LIGHT):
+            url = cached
     else:
-        await bot.send(event, "客服小祥正在为您: 生成kzgo-eu图片...")
-        url = await kzgoeu_screenshot_async(cd.steamid, cd.mode, force_update=cd.update)
+        async with admitted(event, RENDER):
+            if cd.mode == "kz_vanilla":
+                await bot.send(event, "客服小祥正在为您: 生成vnl-kz图片...")
+                url = await vnl_screenshot_async(cd.steamid, force_update=cd.update)
+            else:
+                await bot.send(event, "客服小祥正在为您: 生成kzgo-eu图片...")
+                url = await kzgoeu_screenshot_async(cd.steamid, cd.mode, force_update=cd.update)
 
     image_path = Path(url)
     if image_path.exists():
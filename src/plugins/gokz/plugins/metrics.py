@@ -0,0 +1,118 @@
+import time
+from typing import Optional
+
+from nonebot import on_command, get_driver, logger
+from nonebot.consts import PREFIX_KEY, CMD_KEY
+from nonebot.drivers import ASGIMixin, HTTPServerSetup, URL, Request, Response
+from nonebot.matcher import Matcher
+from nonebot.message import run_preprocessor, run_postprocessor
+from nonebot.permission import SUPERUSER
+from nonebot.typing import T_State
+
+from ..api.cache import response_cache
+from ..api.leaderboard_refresh import leaderboard_refresher
+from ..api.resilience import circuit_stats
+from ..core.admission import admission_control
+from ..core.kz.image_cache import screenshot_cache
+from ..core.kz.screenshot import driver_pool
+from ..core.metrics import registry, command_seconds, command_db_seconds, upstream_seconds, render_seconds
+from ..db.user_cache import user_cache
+
+STARTED_KEY = '_gokz_metrics_started'
+
+metrics = on_command("metrics", aliases={"指标"}, permission=SUPERUSER)
+
+
+def _cache_hit_ratios():
+    yield {'cache': 'response'}, response_cache.stats()['hit_ratio']
+    yield {'cache': 'user'}, user_cache.stats()['hit_ratio']
+
+
+def _queue_depths():
+    for name, stats in admission_control.stats().items():
+        yield {'queue': name}, stats['waiting']
+    yield {'queue': 'leaderboard_refresh'}, leaderboard_refresher.stats()['queued']
+
+
+def _running():
+    for name, stats in admission_control.stats().items():
+        yield {'class': name}, stats['running']
+
+
+def _admission_rejections():
+    for name, stats in admission_control.stats().items():
+        yield {'class': name, 'reason': 'busy'}, stats['rejected']
+        yield {'class': name, 'reason': 'rate_limited'}, stats['throttled']
+
+
+def _circuits():
+    for host, stats in circuit_stats().items():
+        yield {'host': host}, {'closed': 0, 'half-open': 1, 'open': 2}[stats['state']]
+
+
+registry.gauge('gokz_cache_hit_ratio', 'Hit ratio of the in-memory caches', ('cache',), _cache_hit_ratios)
+registry.gauge('gokz_screenshot_cache_bytes', 'Size of the rendered image cache',
+               collect=lambda: [({}, screenshot_cache.stats()['bytes'])])
+registry.gauge('gokz_queue_depth', 'Commands or jobs waiting for a slot', ('queue',), _queue_depths)
+registry.gauge('gokz_commands_running', 'Commands currently running per admission class', ('class',), _running)
+registry.counter('gokz_admission_rejected_total', 'Commands turned away since startup', ('class', 'reason'), _admission_rejections)
+registry.gauge('gokz_render_drivers_idle', 'Warm chrome drivers waiting in the pool',
+               collect=lambda: [({}, driver_pool.stats()['idle'])])
+registry.gauge('gokz_upstream_circuit_state', '0 closed, 1 half-open, 2 open', ('host',), _circuits)
+
+
+@run_preprocessor
+async def start_command_timer(state: T_State):
+    state[STARTED_KEY] = time.perf_counter()
+
+
+@run_postprocessor
+async def observe_command(matcher: Matcher, exception: Optional[Exception]):
+    # the preprocessor's state is merged into matcher.state when the matcher runs
+    started = matcher.state.get(STARTED_KEY)
+    command = matcher.state.get(PREFIX_KEY, {}).get(CMD_KEY)
+    if started is None or not command:
+        return
+    command_seconds.observe(
+        time.perf_counter() - started, command='/'.join(command), outcome='error' if exception else 'ok'
+    )
+
+
+async def prometheus_metrics(request: Request) -> Response:
+    return Response(200, headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}, content=registry.render())
+
+
+driver = get_driver()
+if isinstance(driver, ASGIMixin):
+    driver.setup_http_server(HTTPServerSetup(URL("/metrics"), "GET", "gokz_metrics", prometheus_metrics))
+else:
+    logger.warning("Driver has no HTTP server, /metrics endpoint disabled")
+
+
+def _ms(seconds: float | None) -> str:
+    return f"{seconds * 1000:.0f}" if seconds is not None else '-'
+
+
+@metrics.handle()
+async def _():
+    content = "════指令耗时 (次数 p50/p95 ms)════\n"
+    commands = sorted(command_seconds.summary().items(), key=lambda item: -item[1]['count'])
+    for (command, outcome), summary in commands:
+        content += f"/{command}{'(失败)' if outcome == 'error' else ''}: {summary['count']} | {_ms(summary['p50'])}/{_ms(summary['p95'])}\n"
+
+    db = command_db_seconds.summary().get(())
+    if db:
+        content += f"查询用户: {db['count']} | {_ms(db['p50'])}/{_ms(db['p95'])}\n"
+
+    content += "════上游接口════\n"
+    for (host, outcome), summary in sorted(upstream_seconds.summary().items()):
+        content += f"{host}{'(失败)' if outcome == 'error' else ''}: {summary['count']} | {_ms(summary['p50'])}/{_ms(summary['p95'])}\n"
+
+    content += "════图片生成════\n"
+    for (kind,), summary in sorted(render_seconds.summary().items()):
+        content += f"{kind}: {summary['count']} | {_ms(summary['p50'])}/{_ms(summary['p95'])}\n"
+
+    content += "════排队════\n"
+    for name, stats in admission_control.stats().items():
+        content += f"{name}: 运行{stats['running']} 等待{stats['waiting']} 拒绝{stats['rejected']} 限流{stats['throttled']}\n"
+    await metrics.finish(content.strip())
@@ -0,0 +1,47 @@
+from textwrap import dedent
+
+from nonebot import on_command, require, logger
+from nonebot.permission import SUPERUSER
+
+require("nonebot_plugin_apscheduler")
+
+from nonebot_plugin_apscheduler import scheduler  # noqa: E402
+
+from ..config import LEADERBOARD_SYNC_INTERVAL  # noqa: E402
+from ..core.leaderboard_sync import leaderboard_sync  # noqa: E402
+
+sync_leaderboard = on_command("sync_leaderboard", aliases={"同步排行"}, permission=SUPERUSER)
+
+
+@scheduler.scheduled_job("interval", hours=LEADERBOARD_SYNC_INTERVAL, id="leaderboard_sync", coalesce=True, max_instances=1)
+async def scheduled_leaderboard_sync():
+    try:
+        await leaderboard_sync.run()
+    except Exception as e:
+        logger.error(f"Scheduled leaderboard sync failed: {e!r}")
+
+
+@sync_leaderboard.handle()
+async def _():
+    if leaderboard_sync.running:
+        report = leaderboard_sync.last_report
+        return await sync_leaderboard.finish(
+            f"同步进行中: {report.users}人, {report.rows}条, {report.rows_per_second:.1f}条/秒"
+        )
+
+    await sync_leaderboard.send("开始同步排行榜数据")
+    report = await leaderboard_sync.run()
+    if report is None:
+        return await sync_leaderboard.finish("已有同步在进行中")
+
+    content = dedent(f"""
+        ════同步完成════
+        用户:　　{report.users}
+        写入:　　{report.rows}条
+        无数据:　{report.missing}
+        失败:　　{report.failed}
+        耗时:　　{report.elapsed:.0f}秒 ({report.rows_per_second:.1f}条/秒)
+    """).strip()
+    if report.resumed_from:
+        content += f"\n(从 qid {report.resumed_from} 之后继续)"
+    await sync_leaderboard.finish(content)
@@ -0,0 +1,4 @@
+from benchmarks._bootstrap import bootstrap
+
+# import the plugin's modules without running the bot or connecting to MySQL
+bootstrap()
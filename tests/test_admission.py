@@ -0,0 +1,87 @@
+import asyncio
+from dataclasses import dataclass
+
+import pytest
+
+from src.plugins.gokz.core import admission
+from src.plugins.gokz.core.admission import AdmissionControl, CommandClass, Rejected, TokenBucket
+
+
+@dataclass
+class FakeEvent:
+    user_id: str = "10001"
+    group_openid: str | None = None
+
+    def get_user_id(self) -> str:
+        return self.user_id
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = TokenBucket(capacity=2, per_minute=6)  # one token every 10s
+    assert bucket.take(1) == 0
+    assert bucket.take(1) == 0
+    assert bucket.take(1) == pytest.approx(10)
+
+    clock[0] += 5
+    assert bucket.take(1) == pytest.approx(5)
+    clock[0] += 5
+    assert bucket.take(1) == 0
+
+    clock[0] += 3600  # never more than the burst
+    assert bucket.take(2) == 0
+    assert bucket.take(1) > 0
+
+
+def test_group_rejection_refunds_the_user(clock):
+    control = AdmissionControl(user_burst=5, user_per_minute=1, group_burst=1, group_per_minute=1)
+    event = FakeEvent(group_openid="group")
+
+    assert len(control._charge(event, 1)) == 2
+    with pytest.raises(Rejected, match="本群"):
+        control._charge(event, 1)
+
+    user_bucket = control._bucket('user', event.user_id, control.user_limits)
+    assert user_bucket.tokens == 4  # only the admitted call was paid for
+
+
+def test_class_limit_rejects_beyond_the_queue():
+    command_class = CommandClass('test', concurrency=1, max_queue=1, cost=1, max_wait=5)
+    control = AdmissionControl(user_burst=10, user_per_minute=1, group_burst=10, group_per_minute=1)
+    control.classes = {command_class.name: command_class}
+    release = asyncio.Event()
+
+    async def command(user_id):
+        async with control.admit(FakeEvent(user_id), command_class):
+            await release.wait()
+
+    async def settle(running, waiting):
+        # even an uncontested call counts as waiting until wait_for hands it the slot
+        for _ in range(10):
+            if (command_class.running, command_class.waiting) == (running, waiting):
+                return
+            await asyncio.sleep(0)
+        raise AssertionError(f"{command_class.running} running, {command_class.waiting} waiting")
+
+    async def main():
+        tasks = [asyncio.create_task(command("1"))]
+        try:
+            await settle(1, 0)
+            tasks.append(asyncio.create_task(command("2")))
+            await settle(1, 1)
+
+            with pytest.raises(Rejected, match=admission.BUSY_MESSAGE):
+                await command("3")
+            assert control._bucket('user', "3", control.user_limits).tokens == 10
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert control.stats()['test'] == {'running': 0, 'waiting': 0, 'admitted': 2, 'rejected': 1, 'throttled': 0}
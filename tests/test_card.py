@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+import pytest
+from PIL import ImageFont
+
+from src.plugins.gokz.core.kz import card
+
+FIXTURE = Path(__file__).parent / "fixtures" / "card_records.json"
+
+
+@pytest.fixture
+def fixture():
+    with FIXTURE.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def stats(fixture):
+    return card.summarize_records(fixture["records"], tiers=fixture["tiers"])
+
+
+@pytest.fixture
+def builtin_font(monkeypatch):
+    """layout checks don't need CJK glyphs, Pillow's own font is enough"""
+    card._font.cache_clear()
+    card._background.cache_clear()
+    monkeypatch.setattr(card, "_font", lambda size: ImageFont.load_default(size))
+    yield
+    card._background.cache_clear()
+
+
+def test_summarize_records(stats):
+    assert (stats.name, stats.steamid, stats.mode) == ("小祥", "STEAM_1:0:530988200", "kzt")
+    assert (stats.tp_count, stats.tp_points, stats.tp_1000) == (6, 4720, 1)
+    assert (stats.pro_count, stats.pro_points, stats.pro_1000) == (4, 3700, 2)
+    assert stats.total_points == 8420
+
+    progress = {tier: (p.total, p.tp, p.pro) for tier, p in stats.tiers.items()}
+    assert progress == {
+        1: (1, 1, 1), 2: (1, 1, 1), 3: (0, 0, 0), 4: (1, 1, 1), 5: (1, 1, 0), 6: (1, 0, 1), 7: (2, 1, 0),
+    }
+
+
+def test_render_card(stats, builtin_font):
+    img = card.render_card(stats)
+    assert img.size == (card.WIDTH, card.HEIGHT)
+
+    def bar_pixel(tier, row, x):
+        top = card.HEADER_HEIGHT + card.STATS_HEIGHT + (tier - 1) * card.TIER_ROW_HEIGHT
+        return img.getpixel((x, top + 6 + row * 18 + 6))
+
+    end = card.WIDTH - 150
+    assert bar_pixel(1, 0, end) == card.TP_COLOR  # 1/1 TP, full bar
+    assert bar_pixel(1, 1, end) == card.PRO_COLOR
+    assert bar_pixel(3, 0, 200) == card.BAR_BG  # no tier 3 maps
+    assert bar_pixel(7, 0, 200) == card.TP_COLOR  # 1/2, half filled
+    assert bar_pixel(7, 0, end) == card.BAR_BG
+
+
+def test_missing_font_fails_clearly(monkeypatch, tmp_path):
+    card._font.cache_clear()
+    monkeypatch.setattr(card, "CARD_FONT_PATH", str(tmp_path / "missing.ttf"))
+    with pytest.raises(card.CardFontMissing, match="CJK"):
+        card._font(20)
+    card._font.cache_clear()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks._bootstrap import FIXTURES
+from src.plugins.gokz.core import record_store as store_module
+from src.plugins.gokz.core.record_store import RecordStore, best_records
+from src.plugins.gokz.db.models import Record, RecordSyncState, ServerUsage
+
+STEAM_ID = 'STEAM_1:0:530988200'
+
+
+@pytest.fixture
+def records():
+    with open(FIXTURES / 'records.json', encoding='utf-8') as f:
+        return sorted(json.load(f), key=lambda record: record['created_on'])
+
+
+@pytest.fixture
+def database(monkeypatch, tmp_path):
+    """the store on sqlite, with the MySQL upserts swapped for sqlite's ON CONFLICT"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'records.db'}")
+
+    async def upsert(session, model, rows, update_columns=None, commit=True):
+        statement = insert(model).values(rows)
+        primary_keys = [column.name for column in model.__table__.primary_key]
+        update_columns = update_columns or [key for key in rows[0] if key not in primary_keys]
+        await session.exec(statement.on_conflict_do_update(
+            index_elements=primary_keys, set_={key: statement.excluded[key] for key in update_columns}
+        ))
+
+    async def increment(session, model, rows, column, commit=True):
+        statement = insert(model).values(rows)
+        primary_keys = [column.name for column in model.__table__.primary_key]
+        await session.exec(statement.on_conflict_do_update(
+            index_elements=primary_keys, set_={column: getattr(model, column) + statement.excluded[column]}
+        ))
+
+    monkeypatch.setattr(store_module, 'async_session', lambda: AsyncSession(engine, expire_on_commit=False))
+    monkeypatch.setattr(store_module, 'upsert', upsert)
+    monkeypatch.setattr(store_module, 'increment', increment)
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            tables = [Record.__table__, RecordSyncState.__table__, ServerUsage.__table__]
+            await connection.run_sync(SQLModel.metadata.create_all, tables=tables)
+
+    asyncio.run(create_tables())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def upstream(monkeypatch, records):
+    """api.gokz.top with the records published so far, `created_since` is inclusive like a lax api"""
+    published = []
+
+    async def fetch_json(url, params=None, **kwargs):
+        if since := params.get('created_since'):
+            since = datetime.fromisoformat(since)
+            return [record for record in published if datetime.fromisoformat(record['created_on']) >= since]
+        return list(published)
+
+    monkeypatch.setattr(store_module, 'fetch_json', fetch_json)
+    return published
+
+
+async def usage(engine) -> dict:
+    async with AsyncSession(engine) as session:
+        rows = await session.exec(select(ServerUsage).where(ServerUsage.steam_id == STEAM_ID))  # NOQA
+        return {(row.mode, row.scope, row.server_name): row.count for row in rows}
+
+
+def expected_usage(records) -> dict:
+    counts = Counter(('kz_timer', 'all', record['server_name']) for record in records)
+    counts.update(('kz_timer', 'top', record['server_name']) for record in best_records(records))
+    return dict(counts)
+
+
+def test_incremental_and_full_sync_agree(database, upstream, records):
+    store = RecordStore(sync_interval=timedelta(0))
+
+    async def main():
+        results = []
+        # the first sync is a full one, the later ones only add what was published since
+        for end in (len(records) * 6 // 10, len(records) * 8 // 10, len(records)):
+            upstream[:] = records[:end]
+            await store.sync(STEAM_ID, 'kzt')
+            results.append(await usage(database))
+        assert (store.full_syncs, store.incremental_syncs) == (1, 2)
+
+        await store.sync(STEAM_ID, 'kzt', force_update=True)
+        assert store.full_syncs == 2
+        results.append(await usage(database))
+        return results
+
+    *incremental, full = asyncio.run(main())
+    assert incremental[0] == expected_usage(records[:len(records) * 6 // 10])
+    assert incremental[-1] == full == expected_usage(records)
+
+
+def test_full_and_incremental_sync_of_one_player_take_turns(database, upstream, records):
+    store = RecordStore(sync_interval=timedelta(0))
+
+    async def main():
+        upstream[:] = records[:len(records) // 2]
+        await store.sync(STEAM_ID, 'kzt')
+        upstream[:] = records
+        await asyncio.gather(store.sync(STEAM_ID, 'kzt'), store.sync(STEAM_ID, 'kzt', force_update=True))
+        return await usage(database)
+
+    assert asyncio.run(main()) == expected_usage(records)